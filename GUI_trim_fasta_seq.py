@@ -37,7 +37,268 @@ Contact: thomas.guilment@gmail.com
 
 import os
 from PySide6 import QtWidgets, QtGui, QtCore
-import numpy as np
+from s_trim_fasta_seq import f_dry_run, f_report_dry_run, f_count_records, f_run_files, \
+    SharedCounters, L_COUNTERS, D_STATE_DONE, D_STATE_FAILED
+
+
+# number of files sent at once to the list while the folder is read
+BATCH_SIZE = 500
+
+# milliseconds between two refreshes of the progress of the processing
+PROGRESS_INTERVAL = 200
+
+# maximum number of files counted at the same time (the other threads of the pool stay
+# free for the folder scanner)
+MAX_COUNTERS = max(1, QtCore.QThread.idealThreadCount() - 1)
+
+# number of records of the files already counted: {(path, size, modification time): count}
+RECORD_COUNT_CACHE = {}
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            return ("%d %s" if unit == 'B' else "%.1f %s") % (size, unit)
+        size /= 1024
+
+
+class WorkerSignals(QtCore.QObject):
+    # generation of the folder, list of (file name, size, modification time)
+    files_found = QtCore.Signal(int, list)
+    # generation of the folder, file name, number of records
+    records_counted = QtCore.Signal(int, str, int)
+
+
+class FolderScanner(QtCore.QRunnable):
+    """
+        Read a folder in a background thread with os.scandir and send the FASTA files
+        found by batches, so that the list is filled while the folder is read.
+    """
+
+    def __init__(self, folder, generation):
+        super().__init__()
+        self.folder = folder
+        self.generation = generation
+        self.signals = WorkerSignals()
+
+    def run(self):
+        batch = []
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                name = entry.name.lower()
+                if (name.endswith('.fasta') or name.endswith('.fa')) and entry.is_file():
+                    stat = entry.stat()
+                    batch.append((entry.name, stat.st_size, stat.st_mtime_ns))
+                    if len(batch) >= BATCH_SIZE:
+                        self.signals.files_found.emit(self.generation, batch)
+                        batch = []
+        if batch:
+            self.signals.files_found.emit(self.generation, batch)
+
+
+class RecordCounter(QtCore.QRunnable):
+    """
+        Count the records of a file in a background thread (header only scan).
+    """
+
+    def __init__(self, path, name, generation, signals):
+        super().__init__()
+        self.path = path
+        self.name = name
+        self.generation = generation
+        self.signals = signals
+
+    def run(self):
+        try:
+            count = f_count_records(self.path)
+        except OSError:
+            count = -1
+        self.signals.records_counted.emit(self.generation, self.name, count)
+
+
+class FileListModel(QtCore.QAbstractTableModel):
+    """
+        Files of a folder with their size and number of records.
+        The rows are added while the folder is read (FolderScanner) and the number of
+        records is only counted when a row is displayed (RecordCounter), then cached.
+    """
+
+    HEADERS = ["File", "Size", "Records"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder = ''
+        self.generation = 0
+        # rows: [file name, size, modification time, number of records or None]
+        self.files = []
+        self.rows = {}
+        self.checked = set()
+        self.pending = set()
+        # files waiting to be counted and number of counters running
+        self.waiting = []
+        self.running = 0
+        self.thread_pool = QtCore.QThreadPool.globalInstance()
+        self.signals = WorkerSignals()
+        self.signals.records_counted.connect(self.set_record_count)
+
+    def set_folder(self, folder):
+        self.beginResetModel()
+        self.folder = folder
+        self.generation += 1
+        self.files = []
+        self.rows = {}
+        self.checked = set()
+        self.pending = set()
+        self.waiting = []
+        self.running = 0
+        self.endResetModel()
+
+        # the scanners and counters of the previous folder not started yet are dropped
+        self.thread_pool.clear()
+
+        scanner = FolderScanner(folder, self.generation)
+        scanner.signals.files_found.connect(self.add_files)
+        # the signals must live as long as the model, the runnable is deleted by the pool
+        self.scanner_signals = scanner.signals
+        # the scanner goes before the counters waiting in the pool
+        self.thread_pool.start(scanner, 1)
+
+    def start_counters(self):
+        # the last displayed rows are counted first (the view may have been scrolled
+        # past the rows requested before)
+        while self.waiting and self.running < MAX_COUNTERS:
+            name = self.waiting.pop()
+            self.running += 1
+            self.thread_pool.start(RecordCounter(
+                os.path.join(self.folder, name), name, self.generation, self.signals))
+
+    def add_files(self, generation, batch):
+        # results of a previously selected folder are ignored
+        if generation != self.generation:
+            return
+        first = len(self.files)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(batch) - 1)
+        for name, size, mtime in batch:
+            self.rows[name] = len(self.files)
+            self.files.append(
+                [name, size, mtime, RECORD_COUNT_CACHE.get((os.path.join(self.folder, name), size, mtime))])
+        self.endInsertRows()
+
+    def set_record_count(self, generation, name, count):
+        if generation != self.generation:
+            return
+        self.pending.discard(name)
+        self.running -= 1
+        self.start_counters()
+        row = self.rows[name]
+        file = self.files[row]
+        file[3] = count
+        if count >= 0:
+            RECORD_COUNT_CACHE[(os.path.join(self.folder, name), file[1], file[2])] = count
+        index = self.index(row, 2)
+        self.dataChanged.emit(index, index)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.files)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.column() == 0:
+            flags |= QtCore.Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, size, mtime, count = self.files[index.row()]
+
+        if role == QtCore.Qt.CheckStateRole and index.column() == 0:
+            return QtCore.Qt.Checked if name in self.checked else QtCore.Qt.Unchecked
+
+        if role == QtCore.Qt.DisplayRole:
+            if index.column() == 0:
+                return name
+            if index.column() == 1:
+                return format_size(size)
+            if count is None:
+                # the view only asks for the displayed rows: the count starts here
+                if name not in self.pending:
+                    self.pending.add(name)
+                    self.waiting.append(name)
+                    self.start_counters()
+                return "..."
+            return "?" if count < 0 else str(count)
+
+        if role == QtCore.Qt.TextAlignmentRole and index.column() > 0:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.CheckStateRole or index.column() != 0:
+            return False
+        name = self.files[index.row()][0]
+        if QtCore.Qt.CheckState(value) == QtCore.Qt.Checked:
+            self.checked.add(name)
+        else:
+            self.checked.discard(name)
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def checked_files(self):
+        return [file[0] for file in self.files if file[0] in self.checked]
+
+
+class BatchRunner(QtCore.QThread):
+    """
+        Process files with f_run_files in a background thread (the files themselves are
+        processed in worker processes), the progress being read from the counters.
+    """
+
+    def __init__(self, paths, counters, jobs, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.counters = counters
+        self.jobs = jobs
+        self.error = ''
+
+    def run(self):
+        try:
+            f_run_files(self.paths, self.counters, self.jobs)
+        except Exception as error:
+            self.error = str(error)
+
+
+class DryRunner(QtCore.QThread):
+    """
+        Count with f_dry_run the sequences that would be kept and removed, in a background
+        thread, the report being read when the thread is finished.
+    """
+
+    def __init__(self, files, paths, parent=None):
+        super().__init__(parent)
+        self.files = files
+        self.paths = paths
+        self.summary = []
+        self.details = []
+        self.error = ''
+
+    def run(self):
+        try:
+            for file, file_path in zip(self.files, self.paths):
+                l_report = f_report_dry_run(file, f_dry_run(file_path))
+                self.summary.append(l_report[0])
+                self.details.extend(l_report)
+        except Exception as error:
+            self.error = str(error)
 
 
 class FileSelector(QtWidgets.QWidget):
@@ -54,10 +315,18 @@ class FileSelector(QtWidgets.QWidget):
         self.folder_button.clicked.connect(self.select_folder)
         layout.addWidget(self.folder_button)
 
-        # create a list widget for displaying files in the selected folder
-        self.file_list = QtWidgets.QListWidget()
+        # create a view displaying the files of the selected folder
+        # (only the displayed rows are created, see FileListModel)
+        self.file_model = FileListModel(self)
+        self.file_list = QtWidgets.QTreeView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setRootIsDecorated(False)
+        self.file_list.setUniformRowHeights(True)
         self.file_list.setSelectionMode(
             QtWidgets.QAbstractItemView.MultiSelection)
+        self.file_list.header().setStretchLastSection(False)
+        self.file_list.header().setSectionResizeMode(
+            0, QtWidgets.QHeaderView.Stretch)
         layout.addWidget(self.file_list)
 
         # create a button for processing the selected files
@@ -65,6 +334,25 @@ class FileSelector(QtWidgets.QWidget):
         self.process_button.clicked.connect(self.process_files)
         layout.addWidget(self.process_button)
 
+        # create a button for counting the sequences that would be kept and removed
+        self.dry_run_button = QtWidgets.QPushButton("Dry Run (Statistics Only)")
+        self.dry_run_button.clicked.connect(self.dry_run_files)
+        layout.addWidget(self.dry_run_button)
+
+        # create a progress bar and a label displaying the progress of the processing
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+        self.progress_label = QtWidgets.QLabel()
+        self.progress_label.hide()
+        layout.addWidget(self.progress_label)
+
+        # timer reading the counters published by the processes
+        self.progress_timer = QtCore.QTimer(self)
+        self.progress_timer.timeout.connect(self.update_progress)
+
         # set the layout for the app
         self.setLayout(layout)
 
@@ -76,378 +364,99 @@ class FileSelector(QtWidgets.QWidget):
             self.populate_file_list(folder)
 
     def populate_file_list(self, folder):
-        self.file_list.clear()
-        for file_name in os.listdir(folder):
-            if os.path.isfile(os.path.join(folder, file_name)):
-                if file_name.lower().endswith('.fasta') or file_name.lower().endswith('.fa'):
-                    item = QtWidgets.QListWidgetItem(file_name)
-                    item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    item.setCheckState(QtCore.Qt.Unchecked)
-                    self.file_list.addItem(item)
+        # the folder is read in the background, the list is filled as files are found
+        self.file_model.set_folder(folder)
 
-    def process_files(self):
-        selected_files = []
-        selected_files_path = []
+    def checked_files(self):
         folder_path = self.folder_button.text()
-        for index in range(self.file_list.count()):
-            item = self.file_list.item(index)
-            if item.checkState() == QtCore.Qt.Checked:
-                selected_files.append(item.text())
-                selected_files_path.append(
-                    os.path.join(folder_path, item.text()))
-
-        if selected_files:
-            print("Selected files:", selected_files)
-            print("Selected files:", selected_files_path)
+        selected_files = self.file_model.checked_files()
+        selected_files_path = [os.path.join(folder_path, file)
+                               for file in selected_files]
+        return selected_files, selected_files_path
 
-            for file in selected_files_path:
-                f_update_file(file)
+    def dry_run_files(self):
+        selected_files, selected_files_path = self.checked_files()
 
-            QtCore.QCoreApplication.quit()
+        if selected_files:
+            # the files are read in the background, the report is displayed at the end
+            self.dry_runner = DryRunner(selected_files, selected_files_path, self)
+            self.dry_runner.finished.connect(self.dry_run_finished)
+            for button in [self.folder_button, self.process_button, self.dry_run_button]:
+                button.setEnabled(False)
+            self.dry_run_button.setText("Dry Run in progress...")
+            self.dry_runner.start()
         else:
             QtWidgets.QMessageBox.warning(
                 self, "Warning", "Please select at least one file for processing.")
 
+    def dry_run_finished(self):
+        for button in [self.folder_button, self.process_button, self.dry_run_button]:
+            button.setEnabled(True)
+        self.dry_run_button.setText("Dry Run (Statistics Only)")
 
-def f_update_file(s_path_filename):
-    """
-        This function clean the file then start by removing unwanted sequences that contain 
-        (in lower or upper case) "sp", "cf" or "mitochondrion" in their name.
-        Sequence names ending with "idae" are also removed. 
-        Finally, if there are more than 3 sequences associated with the same species name 
-        then only the 3 longest sequences are kept.
-
-        Args:
-            s_path_filename: Absolute path to the file that will be processed
-
-
-        Returns:
-            None
-
-    """
-
-    # Read all the file
-    with open(s_path_filename, 'r') as f:
-        lines = f.readlines()
-
-    # Clean list (remove potential extra empty line and be sure to have a empty line
-    # before each sequence except the first one)
-    l_clean = []
-
-    # First sequence
-    b_first_sequence = 1
+        if self.dry_runner.error:
+            QtWidgets.QMessageBox.critical(
+                self, "Error", "The dry run failed: " + self.dry_runner.error)
+            return
 
-    for line in lines:
+        message = QtWidgets.QMessageBox(self)
+        message.setWindowTitle("Dry Run")
+        message.setText("\n".join(self.dry_runner.summary))
+        message.setDetailedText("\n".join(self.dry_runner.details))
+        message.exec()
 
-        # Find the lines associated with the symbol '>' as a start
-        # If the symbol '>' is found then extract each group of "words"
-        if line[0] == '>':
-
-            if b_first_sequence == 1:
-                l_clean.append(line)
-                b_first_sequence = 0
+    def process_files(self):
+        selected_files, selected_files_path = self.checked_files()
 
-            else:
-                l_clean.append('\n')
-                l_clean.append(line)
+        if selected_files:
+            print("Selected files:", selected_files)
+            print("Selected files:", selected_files_path)
 
+            self.total_size = sum(os.path.getsize(file)
+                                  for file in selected_files_path)
+            self.counters = SharedCounters(len(selected_files_path))
+            jobs = min(os.cpu_count() or 1, len(selected_files_path))
+            self.runner = BatchRunner(
+                selected_files_path, self.counters, jobs, self)
+            self.runner.finished.connect(self.processing_finished)
+
+            for button in [self.folder_button, self.process_button, self.dry_run_button]:
+                button.setEnabled(False)
+            self.progress_bar.show()
+            self.progress_label.show()
+            self.progress_timer.start(PROGRESS_INTERVAL)
+            self.runner.start()
         else:
-            if not (line[0] == '\n') and b_first_sequence == 0:
-                l_clean.append(line)
-
-    l_clean.append('\n')
-
-    # List of removed sequences
-    l_removed = []
-
-    # Names and sequence size
-    l_names = []
-    l_seq_size = []
-
-    # Index of names
-    l_index_names = []
-
-    # Once the sequences format is cleaned then the selection can be performed
-    # Index of lines
-    d_line_number = -1
-
-    while d_line_number < len(l_clean)-1:
-        d_line_number += 1
-
-        line = l_clean[d_line_number]
-
-        # If the symbol '>' is found then extract each group of "words"
-        if line[0] == '>':
-
-            # if '_' in line :
-            if line.count('_') > line.count(' '):
-                words = line.split('_')
-                b_edited = 1
-            else:
-                words = line.split()
-                b_edited = 0
-
-            # Test if one of the 2nd, 3rd or 4th word contain only "sp", "sp.", "cf" or "cf." (passing everything in lowercase for every tests)
-            # Boolean to decide if the squence is kept or not
-            b_keep = 1
-
-            # Convert the words of interest in lowercase
-            list_lowercase = [x.lower() for x in words]  # [1:4]]
-
-            words_to_check = ['sp.', 'sp', 'cf', 'cf.',
-                              'mitochondrion', 'mitochondrion,', 'mitochondrion,\n']
-            if any(word in list_lowercase or words[1][-4:] == 'idae' for word in words_to_check):
-                b_keep = 0
-
-            # if list_lowercase.count('sp.') > 0 \
-            #         or list_lowercase.count('sp') > 0 \
-            #         or list_lowercase.count('cf') > 0 \
-            #         or list_lowercase.count('cf.') > 0\
-            #         or list_lowercase.count('mitochondrion') > 0\
-            #         or list_lowercase.count('mitochondrion,') > 0\
-            #         or list_lowercase.count('mitochondrion,\n') > 0\
-            #         or words[1][-4::] == 'idae':
-            #     b_keep = 0
-
-        if b_edited:
-
-            # If the sequence is kept, the name and sequence size are saved
-            if b_keep == 1:
-                l_names.append(words)
-
-                l_clean[d_line_number] = '_'.join(words)
-
-                d_size_seq = 0
-
-                l_index_names.append(d_line_number)
-
-                while l_clean[d_line_number] != '\n':
-                    d_line_number += 1
-                    d_size_seq += len(l_clean[d_line_number])
-
-                l_seq_size.append(d_size_seq)
-
-            # Else the sequence is removed and save in the removed list
-            else:
-
-                l_removed.append('_'.join(words))
-
-                while l_clean[d_line_number] != '\n':
-                    del l_clean[d_line_number]
-                    l_removed.append(l_clean[d_line_number])
-
-                del l_clean[d_line_number]
-
-                d_line_number -= 1
+            QtWidgets.QMessageBox.warning(
+                self, "Warning", "Please select at least one file for processing.")
 
+    def update_progress(self):
+        counters = self.counters.array
+        states = counters[:, L_COUNTERS.index('state')]
+        read = counters[:, L_COUNTERS.index('bytes')].sum()
+        self.progress_bar.setValue(
+            int(1000 * read / self.total_size) if self.total_size else 1000)
+        self.progress_label.setText(
+            "%d/%d files processed (%d failed), %d records: %d kept, %d filtered, %d trimmed" % (
+                (states == D_STATE_DONE).sum(), len(states), (states == D_STATE_FAILED).sum(),
+                counters[:, L_COUNTERS.index('records')].sum(),
+                counters[:, L_COUNTERS.index('kept')].sum(),
+                counters[:, L_COUNTERS.index('filtered')].sum(),
+                counters[:, L_COUNTERS.index('trimmed')].sum()))
+
+    def processing_finished(self):
+        self.progress_timer.stop()
+        self.update_progress()
+        self.counters.close()
+        self.counters.unlink()
+
+        if self.runner.error:
+            QtWidgets.QMessageBox.critical(
+                self, "Error", "The processing failed: " + self.runner.error)
+            for button in [self.folder_button, self.process_button, self.dry_run_button]:
+                button.setEnabled(True)
         else:
-            # If the sequence is kept, the name and sequence size are saved
-            if b_keep == 1:
-                l_names.append(words)
-
-                if len(words) == 4:
-                    l_clean[d_line_number] = '_'.join(
-                        [words[0][:-2], words[1], words[2], words[3]]) + '\n'
-
-                    d_size_seq = 0
-
-                    l_index_names.append(d_line_number)
-
-                    while l_clean[d_line_number] != '\n':
-                        d_line_number += 1
-                        d_size_seq += len(l_clean[d_line_number])
-
-                    l_seq_size.append(d_size_seq)
-
-                else:
-                    l_clean[d_line_number] = '_'.join(
-                        [words[0], words[1], words[2]]) + '\n'
-
-                    d_size_seq = 0
-
-                    l_index_names.append(d_line_number)
-
-                    while l_clean[d_line_number] != '\n':
-                        d_line_number += 1
-                        d_size_seq += len(l_clean[d_line_number])
-
-                    l_seq_size.append(d_size_seq)
-
-            # Else the sequence is removed and save in the removed list
-            else:
-
-                if len(words) == 4:
-                    l_removed.append(
-                        '_'.join([words[0][:-2], words[1], words[2], words[3]]) + '\n')
-
-                else:
-                    l_removed.append(
-                        '_'.join([words[0], words[1], words[2]]) + '\n')
-
-                while l_clean[d_line_number] != '\n':
-                    del l_clean[d_line_number]
-                    l_removed.append(l_clean[d_line_number])
-
-                del l_clean[d_line_number]
-
-                d_line_number -= 1
-
-    if b_edited:
-        # Process and identify the name that are present more than 3 times
-        l_aux_names = []
-        for name in l_names:
-            l_aux_names.append('_'.join(name[-3:-1]))
-
-        # Only keep different names
-        l_unique_names = list(set(l_aux_names))
-
-        # For each name count how many examples they are
-        l_count_names = []
-        for name in l_unique_names:
-            l_count_names.append(l_aux_names.count(name))
-
-        # Identify the one that are more than 3 examples:
-        l_redondant_seq = []
-        l_number_of_seq = []
-
-        # Number of sequence to keep
-        d_seq_to_keep = 3
-
-        # Auxiliary sequence (removing sequences by inserting a unique sequences to preserve the previous indexation)
-        l_aux_clean = list(l_clean)
-
-        # Better "pythonic way" to code this (should be changed)
-        d_count = -1
-        for d_size in l_count_names:
-            d_count += 1
-            if d_size > d_seq_to_keep:
-                l_redondant_seq.append(l_unique_names[d_count])
-                l_number_of_seq.append(l_count_names[d_count])
-
-        # Identify and only keep the 3 biggest sequences
-        # <=> removing the smallest sequences until there are 3 left
-        for redondant_name in l_redondant_seq:
-            d_count = -1
-            l_aux_size_seq = []
-            l_aux_index_seq = []
-            for name in l_aux_names:
-                d_count += 1
-                if name == redondant_name:
-                    l_aux_size_seq.append(l_seq_size[d_count])
-                    l_aux_index_seq.append(d_count)
-
-            # Identify the sequences that need to be removed
-            while len(l_aux_size_seq) > d_seq_to_keep:
-
-                d_index_line = l_index_names[l_aux_index_seq[np.argmin(
-                    l_aux_size_seq)]]
-
-                for d_aux_index_line in range(d_index_line, l_index_names[np.min([l_aux_index_seq[np.argmin(l_aux_size_seq)]+1, len(l_index_names)-1])]):
-
-                    l_removed.append(l_clean[d_aux_index_line])
-
-                    # Choose a special series of characters to remove later
-                    l_aux_clean[d_aux_index_line] = '$!@'
-
-                del l_aux_index_seq[np.argmin(l_aux_size_seq)]
-                del l_aux_size_seq[np.argmin(l_aux_size_seq)]
-
-        d_count = -1
-        for line in l_aux_clean:
-            d_count += 1
-            if line == '$!@':
-                del l_clean[d_count]
-                d_count -= 1
-
-        s_path_filename_updated = s_path_filename[:-6] + '_trimmed' + '.fasta'
-        s_path_filename_removed = s_path_filename[:-6] + '_removed' + '.fasta'
-
-        print('Creation of ' + s_path_filename_updated +
-              ' and ' + s_path_filename_removed)
-        with open(s_path_filename_updated, 'w') as f:
-            f.writelines(l_clean)
-
-        with open(s_path_filename_removed, 'w') as f:
-            f.writelines(l_removed)
-
-    else:
-
-        # Process and identify the name that are present more than 3 times
-        l_aux_names = []
-        for name in l_names:
-            l_aux_names.append('_'.join(name[1:3]))
-
-        # Only keep different names
-        l_unique_names = list(set(l_aux_names))
-
-        # For each name count how many examples they are
-        l_count_names = []
-        for name in l_unique_names:
-            l_count_names.append(l_aux_names.count(name))
-
-        # Identify the one that are more than 3 examples:
-        l_redondant_seq = []
-        l_number_of_seq = []
-
-        # Number of sequence to keep
-        d_seq_to_keep = 3
-
-        # Auxiliary sequence (removing sequences by inserting a unique sequences to preserve the previous indexation)
-        l_aux_clean = list(l_clean)
-
-        # Better "pythonic way" to code this (should be changed)
-        d_count = -1
-        for d_size in l_count_names:
-            d_count += 1
-            if d_size > d_seq_to_keep:
-                l_redondant_seq.append(l_unique_names[d_count])
-                l_number_of_seq.append(l_count_names[d_count])
-
-        # Identify and only keep the 3 biggest sequences
-        # <=> removing the smallest sequences until there are 3 left
-        for redondant_name in l_redondant_seq:
-            d_count = -1
-            l_aux_size_seq = []
-            l_aux_index_seq = []
-            for name in l_aux_names:
-                d_count += 1
-                if name == redondant_name:
-                    l_aux_size_seq.append(l_seq_size[d_count])
-                    l_aux_index_seq.append(d_count)
-
-            # Identify the sequences that need to be removed
-            while len(l_aux_size_seq) > d_seq_to_keep:
-
-                d_index_line = l_index_names[l_aux_index_seq[np.argmin(
-                    l_aux_size_seq)]]
-
-                for d_aux_index_line in range(d_index_line, l_index_names[np.min([l_aux_index_seq[np.argmin(l_aux_size_seq)]+1, len(l_index_names)-1])]):
-
-                    l_removed.append(l_clean[d_aux_index_line])
-
-                    # Choose a special series of characters to remove later
-                    l_aux_clean[d_aux_index_line] = '$!@'
-
-                del l_aux_index_seq[np.argmin(l_aux_size_seq)]
-                del l_aux_size_seq[np.argmin(l_aux_size_seq)]
-
-        d_count = -1
-        for line in l_aux_clean:
-            d_count += 1
-            if line == '$!@':
-                del l_clean[d_count]
-                d_count -= 1
-
-        s_path_filename_updated = s_path_filename[:-6] + '_trimmed' + '.fasta'
-        s_path_filename_removed = s_path_filename[:-6] + '_removed' + '.fasta'
-
-        print('Creation of ' + s_path_filename_updated +
-              ' and ' + s_path_filename_removed)
-        with open(s_path_filename_updated, 'w') as f:
-            f.writelines(l_clean)
-
-        with open(s_path_filename_removed, 'w') as f:
-            f.writelines(l_removed)
+            QtCore.QCoreApplication.quit()
 
 
 if __name__ == "__main__":
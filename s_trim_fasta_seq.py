@@ -34,6 +34,20 @@ Contact: thomas.guilment@gmail.com
 
 # importing required modules
 import os
+import io
+import re
+import sys
+import mmap
+import heapq
+import contextlib
+import pickle
+import shutil
+import tempfile
+import time
+import concurrent.futures
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import namedtuple
 import click
 import numpy as np
 
@@ -47,344 +61,1531 @@ import numpy as np
 # No complete mitochondrial genome (mitochondrion) were considered
 # Exception for NC_156651
 
-def f_update_file(s_path_filename):
+# A FASTA record as produced by f_read_records:
+# header (starting with '>', without line ending), sequence lines (without line endings),
+# number of bases, number of ambiguous bases (other than A, C, G, T),
+# byte offset of the '>' in the file, length in bytes in the file and whether
+# these bytes are already written as in the output files (see f_make_record)
+FastaRecord = namedtuple('FastaRecord', ['header', 'lines', 'size', 'ambiguous', 'offset',
+                                         'length', 'verbatim'])
+
+
+# Words (in lowercase) leading to the removal of a sequence
+L_WORDS_TO_CHECK = ['sp.', 'sp', 'cf', 'cf.', 'mitochondrion', 'mitochondrion,']
+
+# Number of sequence to keep for each species
+D_SEQ_TO_KEEP = 3
+
+# Suffix of the temporary files written before being renamed to the output files
+S_TMP_SUFFIX = '.tmp'
+
+# Journal of the files already processed by an interrupted batch (in the processed folder)
+S_JOURNAL_FILENAME = '.trim_fasta_seq.journal'
+
+# Size of the buffer of the output files (bytes)
+D_WRITE_BUFFER = 1024 ** 2
+
+# Flag of os.open keeping the line endings as they are on Windows (0 on other platforms)
+D_O_BINARY = getattr(os, 'O_BINARY', 0)
+
+# Counters published for each file while it is processed (columns of SharedCounters):
+# state (see the D_STATE_ constants), records read, kept, removed by the name filters,
+# removed by the selection (trimmed), bytes read and seconds since the start
+L_COUNTERS = ['state', 'records', 'kept', 'filtered', 'trimmed', 'bytes', 'seconds']
+D_STATE_WAITING, D_STATE_RUNNING, D_STATE_DONE, D_STATE_FAILED = 0, 1, 2, 3
+L_STATES = ['waiting', 'running', 'done', 'failed']
+
+# Number of records read between two updates of the counters
+D_PUBLISH_EVERY = 1000
+
+# Seconds between two refreshes of the progress display
+D_POLL_INTERVAL = 0.5
+
+# Number of processed files between two checkpoints of the journal
+D_CHECKPOINT_EVERY = 20
+
+# Ways of choosing the sequences kept for each species:
+# "longest": the longest sequences, "consensus": the sequences closest to the
+# k-mer profile of the species (see f_select_consensus)
+L_SELECTIONS = ['longest', 'consensus']
+
+# Length of the k-mers of the consensus selection
+D_KMER = 4
+
+
+def f_base_codes():
+    """
+        Table giving the code of each byte in the k-mers (see f_kmer_profiles).
+
+        Returns:
+            Array of 256 codes: 0 to 3 for A, C, G and T (in lower or upper case), -1 for
+            the ambiguous bases, which are not counted
+
+    """
+
+    a_codes = np.full(256, -1, dtype=np.int64)
+    for d_code, s_bases in enumerate(['Aa', 'Cc', 'Gg', 'Tt']):
+        for s_base in s_bases:
+            a_codes[ord(s_base)] = d_code
+
+    return a_codes
+
+
+# Code of each base in the k-mers (-1 for ambiguous bases, which are not counted)
+A_BASE_CODES = f_base_codes()
+
+# Estimated memory (in bytes) used by a ranking key of the external mode, in addition
+# to the length of the species name
+D_KEY_MEMORY = 200
+
+# Maximum number of runs of the external mode merged at once (one open file per run)
+D_MERGE_FAN_IN = 32
+
+# Version of the accession number (">HQ932670.2 ..." -> 2, ">NC_012345.2 ..." -> 2)
+RE_ACCESSION_VERSION = re.compile(r'^>[^\s.]*\.(\d+)')
+
+# Criteria used to choose between sequences of the same size (the lowest value wins):
+# "ambiguous": fewer ambiguous bases, "version": newer accession version
+D_TIE_BREAKERS = {
+    'ambiguous': lambda record: record.ambiguous,
+    'version': lambda record: -f_accession_version(record.header),
+}
+
+# Tie breakers used by default, in order
+L_TIE_BREAKERS = ['ambiguous', 'version']
+
+
+def f_line_ending(data):
+    """
+        Line ending used to find the records of a FASTA file: LF for files with LF or CRLF
+        line endings, CR for files with CR line endings only (they do not contain any LF).
+
+        Args:
+            data: Content of the file (bytes or mmap)
+
+        Returns:
+            b'\\n' or b'\\r'
+
+    """
+
+    return b'\n' if data.find(b'\n') >= 0 else b'\r'
+
+
+def f_find_records(data, s_eol):
+    """
+        Find the start of the records in the content of a FASTA file: a '>' at the
+        beginning of the file or right after a line ending.
+
+        Args:
+            data: Content of the file (bytes or mmap)
+            s_eol: Line ending of the file (see f_line_ending)
+
+        Returns:
+            Generator of the offsets of the '>' starting each record
+
+    """
+
+    if data[:1] == b'>':
+        yield 0
+
+    d_pos = data.find(s_eol + b'>')
+    while d_pos >= 0:
+        yield d_pos + 1
+        d_pos = data.find(s_eol + b'>', d_pos + 1)
+
+
+@contextlib.contextmanager
+def f_map_file(s_path_filename):
+    """
+        Memory map a FASTA file as bytes, to be used in a with statement.
+
+        Args:
+            s_path_filename: Absolute path to the file that will be read
+
+        Returns:
+            data: Content of the file (mmap, or empty bytes for an empty file)
+            s_eol: Line ending of the file (see f_line_ending)
+
+    """
+
+    # An empty file can not be memory mapped
+    if os.path.getsize(s_path_filename) == 0:
+        yield b'', b'\n'
+        return
+
+    with open(s_path_filename, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data, f_line_ending(data)
+
+
+def f_read_records(s_path_filename):
+    """
+        Read a FASTA file in a single pass and yield its records.
+        The file is memory mapped as bytes and split on the '>' starting a line, so that
+        CRLF (or CR) line endings, blank or whitespace-only lines, wrapped sequences and
+        a last line without line ending are all handled the same way.
+        Only the current record is held in memory.
+        Anything before the first '>' is ignored.
+
+        Args:
+            s_path_filename: Absolute path to the file that will be read
+
+        Returns:
+            Generator of FastaRecord, in the order of the file
+
+    """
+
+    with f_map_file(s_path_filename) as (data, s_eol):
+        d_start = None
+        for d_end in f_find_records(data, s_eol):
+            if d_start is not None:
+                yield f_make_record(data[d_start:d_end], d_start)
+            d_start = d_end
+
+        if d_start is not None:
+            yield f_make_record(data[d_start:], d_start)
+
+
+def f_make_record(chunk, d_offset):
+    """
+        Build a FastaRecord from the bytes of a record.
+
+        Args:
+            chunk: Bytes from the '>' of the record to the start of the next one
+            d_offset: Offset of the '>' in the file
+
+        Returns:
+            FastaRecord
+
+    """
+
+    # splitlines() accepts every line ending and strip() removes the
+    # remaining spaces so that only the bases are counted
+    l_lines = chunk.splitlines()
+    l_seq = [line.strip() for line in l_lines[1:] if line.strip()]
+
+    # The bytes of the record are the ones written by f_format_record when the lines
+    # end with LF, contain no other white space and the record ends with an empty line:
+    # the record can then be copied as it is (see RecordWriter)
+    b_verbatim = chunk.endswith(b'\n\n') and chunk.count(b'\n') == len(l_seq) + 2 and \
+        len(chunk.translate(None, b' \t\r\x0b\x0c')) == len(chunk)
+
+    return FastaRecord(header=l_lines[0].rstrip().decode(),
+                       lines=[line.decode() for line in l_seq],
+                       size=sum(len(line) for line in l_seq),
+                       ambiguous=sum(len(line.translate(None, b'ACGTacgt'))
+                                     for line in l_seq),
+                       offset=d_offset,
+                       length=len(chunk),
+                       verbatim=b_verbatim)
+
+
+def f_scan_headers(s_path_filename):
+    """
+        Yield the headers of a FASTA file without reading the sequences.
+        The file is memory mapped and only the header lines are decoded, the sequence
+        bytes are skipped by the search of the next record (f_find_records).
+
+        Args:
+            s_path_filename: Absolute path to the file that will be read
+
+        Returns:
+            Generator of headers (starting with '>', without line ending)
+
+    """
+
+    with f_map_file(s_path_filename) as (data, s_eol):
+        for d_start in f_find_records(data, s_eol):
+            d_end = data.find(s_eol, d_start)
+            if d_end < 0:
+                d_end = len(data)
+            yield data[d_start:d_end].rstrip().decode()
+
+
+def f_count_records(s_path_filename):
+    """
+        Number of records of a FASTA file, without reading the sequences nor decoding
+        the headers (see f_scan_headers).
+
+        Args:
+            s_path_filename: Absolute path to the file that will be read
+
+        Returns:
+            Number of records
+
+    """
+
+    with f_map_file(s_path_filename) as (data, s_eol):
+        return sum(1 for d_start in f_find_records(data, s_eol))
+
+
+def f_accession_version(s_header):
+    """
+        Version of the accession number of a header (">HQ932670.2 ..." gives 2).
+
+        Args:
+            s_header: Header of the sequence, starting with '>'
+
+        Returns:
+            Version as an integer, 0 if the header has no version (edited header)
+
+    """
+
+    match = RE_ACCESSION_VERSION.match(s_header)
+    if match:
+        return int(match.group(1))
+    return 0
+
+
+def f_parse_header(s_header):
+    """
+        Build the new header of a sequence, its species name and decide if it is kept.
+        A header is considered as already edited (">HQ932670_Lumbrineris_japonica")
+        when it contains more "_" than spaces, otherwise it is a raw NCBI header
+        (">HQ932670.1 Lumbrineris japonica voucher ...").
+        The sequence is removed if one of its words is "sp", "sp.", "cf", "cf." or
+        "mitochondrion" (in lower or upper case) or if the 2nd word ends with "idae".
+
+        Args:
+            s_header: Header of the sequence, starting with '>' and without line ending
+
+        Returns:
+            s_new_header: Header written in the output files (without line ending)
+            s_name: Species name used to group the sequences
+            b_keep: 1 if the sequence is kept, 0 otherwise
+
+    """
+
+    if s_header.count('_') > s_header.count(' '):
+        words = s_header.split('_')
+        s_new_header = s_header
+        s_name = '_'.join(words[-3:-1])
+
+    else:
+        words = s_header.split()
+        if len(words) == 4:
+            s_new_header = '_'.join([words[0][:-2], words[1], words[2], words[3]])
+        else:
+            s_new_header = '_'.join(words[:3])
+        s_name = '_'.join(words[1:3])
+
+    # Convert the words in lowercase for every tests
+    list_lowercase = [x.lower() for x in words]
+
+    b_keep = 1
+    if any(word in list_lowercase for word in L_WORDS_TO_CHECK) or \
+            (len(words) > 1 and words[1][-4:] == 'idae'):
+        b_keep = 0
+
+    return s_new_header, s_name, b_keep
+
+
+def f_format_record(s_header, l_seq):
+    """
+        Lines of a record as written in the output files: the header, the sequence lines
+        and an empty line separating it from the next record.
+
+        Args:
+            s_header: Header of the sequence (without line ending)
+            l_seq: Sequence lines (without line endings)
+
+        Returns:
+            List of lines ending with '\n'
+
+    """
+
+    return [s_header + '\n'] + [line + '\n' for line in l_seq] + ['\n']
+
+
+def f_rank_key(s_name, record, l_tie_breakers, d_position):
+    """
+        Key used to rank the sequences: species name, decreasing size, then the tie
+        breakers (see D_TIE_BREAKERS) and finally the position in the file (the last
+        one first).
+
+        Args:
+            s_name: Species name of the sequence
+            record: FastaRecord of the sequence
+            l_tie_breakers: Names of the tie breakers, in order
+            d_position: Position of the sequence in the file (index or offset)
+
+        Returns:
+            Tuple, the lowest being the first kept
+
+    """
+
+    return (s_name, -record.size) + \
+        tuple(D_TIE_BREAKERS[s_tie](record) for s_tie in l_tie_breakers) + (-d_position,)
+
+
+def f_walk_ranked(it_keys, d_seq_to_keep):
+    """
+        Walk through keys sorted by f_rank_key and tell which ones are kept: the
+        d_seq_to_keep first ones of each species name.
+
+        Args:
+            it_keys: Iterable of keys sorted by f_rank_key
+            d_seq_to_keep: Number of sequences kept for each species
+
+        Returns:
+            Generator of (key, b_keep)
+
+    """
+
+    s_previous_name = None
+    d_count = 0
+    for key in it_keys:
+        if key[0] != s_previous_name:
+            s_previous_name = key[0]
+            d_count = 0
+        d_count += 1
+        yield key, int(d_count <= d_seq_to_keep)
+
+
+def f_select_longest(l_kept, d_seq_to_keep=D_SEQ_TO_KEEP, l_tie_breakers=L_TIE_BREAKERS):
+    """
+        Select the sequences to remove so that only the d_seq_to_keep longest sequences
+        of each species are kept.
+        All the sequences are ranked in a single sort by species name, decreasing size,
+        then by the tie breakers (see D_TIE_BREAKERS). When sequences are still identical
+        the last one in the file is kept, so the result only depends on the content
+        of the file.
+
+        Args:
+            l_kept: List of (s_name, record) in the order of the file
+            d_seq_to_keep: Number of sequences kept for each species
+            l_tie_breakers: Names of the tie breakers, in order
+
+        Returns:
+            Sorted list of the indexes (in l_kept) of the sequences to remove
+
+    """
+
+    l_keys = sorted(f_rank_key(s_name, record, l_tie_breakers, d_index)
+                    for d_index, (s_name, record) in enumerate(l_kept))
+
+    return sorted(-key[-1] for key, b_keep in f_walk_ranked(l_keys, d_seq_to_keep) if not b_keep)
+
+
+def f_kmer_profiles(l_seq, d_kmer=D_KMER):
+    """
+        K-mer frequencies of sequences, computed for all the sequences at once: the
+        sequences are concatenated (separated by an ambiguous base) and the code of each
+        k-mer is computed for the whole array, then counted per sequence with a single
+        np.bincount. K-mers containing an ambiguous base are not counted.
+
+        Args:
+            l_seq: Sequences (strings)
+            d_kmer: Length of the k-mers
+
+        Returns:
+            Array of shape (number of sequences, 4 ** d_kmer), each row summing to 1
+            (or 0 for a sequence without any k-mer)
+
+    """
+
+    d_size = 4 ** d_kmer
+    a_profiles = np.zeros((len(l_seq), d_size))
+
+    s_all = 'N'.join(l_seq).encode()
+    if len(s_all) < d_kmer:
+        return a_profiles
+
+    a_codes = A_BASE_CODES[np.frombuffer(s_all, dtype=np.uint8)]
+
+    # Sequence of each position (the separators belong to the previous sequence,
+    # they only make the k-mers across two sequences invalid)
+    a_lengths = np.array([len(s_seq) + 1 for s_seq in l_seq])
+    a_seq = np.repeat(np.arange(len(l_seq)), a_lengths)[:len(a_codes)]
+
+    d_count = len(a_codes) - d_kmer + 1
+    a_kmers = np.zeros(d_count, dtype=np.int64)
+    a_valid = np.ones(d_count, dtype=bool)
+    for d_pos in range(d_kmer):
+        a_window = a_codes[d_pos:d_pos + d_count]
+        a_kmers = a_kmers * 4 + a_window
+        a_valid &= a_window >= 0
+
+    a_counts = np.bincount(a_seq[:d_count][a_valid] * d_size + a_kmers[a_valid],
+                           minlength=len(l_seq) * d_size).reshape(len(l_seq), d_size)
+
+    a_totals = a_counts.sum(axis=1, keepdims=True)
+    np.divide(a_counts, a_totals, out=a_profiles, where=a_totals > 0)
+
+    return a_profiles
+
+
+def f_select_consensus(l_kept, d_seq_to_keep=D_SEQ_TO_KEEP, l_tie_breakers=L_TIE_BREAKERS,
+                       d_kmer=D_KMER):
+    """
+        Select the sequences to remove so that only the d_seq_to_keep sequences closest
+        to the consensus of each species are kept, instead of the longest ones (a long
+        sequence can be misidentified).
+        The consensus is the mean of the k-mer profiles of the sequences of the species
+        (f_kmer_profiles) and the sequences are ranked by squared euclidean distance to
+        it, with one matrix operation per species. Sequences at the same distance are
+        ranked as in f_select_longest.
+        Species with d_seq_to_keep sequences or less are kept entirely.
+
+        Args:
+            l_kept: List of (s_name, record) in the order of the file
+            d_seq_to_keep: Number of sequences kept for each species
+            l_tie_breakers: Names of the tie breakers, in order
+            d_kmer: Length of the k-mers
+
+        Returns:
+            Sorted list of the indexes (in l_kept) of the sequences to remove
+
+    """
+
+    d_index_names = {}
+    for d_index, (s_name, record) in enumerate(l_kept):
+        d_index_names.setdefault(s_name, []).append(d_index)
+
+    l_trimmed = []
+    for s_name, l_aux_index_seq in d_index_names.items():
+        if len(l_aux_index_seq) <= d_seq_to_keep:
+            continue
+
+        a_profiles = f_kmer_profiles([''.join(l_kept[d_index][1].lines)
+                                      for d_index in l_aux_index_seq], d_kmer)
+        a_distances = ((a_profiles - a_profiles.mean(axis=0)) ** 2).sum(axis=1)
+
+        l_order = sorted(range(len(l_aux_index_seq)), key=lambda i: (
+            a_distances[i],
+            f_rank_key(s_name, l_kept[l_aux_index_seq[i]][1], l_tie_breakers, l_aux_index_seq[i])))
+        l_trimmed.extend(l_aux_index_seq[i] for i in l_order[d_seq_to_keep:])
+
+    return sorted(l_trimmed)
+
+
+def f_update_file(s_path_filename, l_tie_breakers=L_TIE_BREAKERS, d_memory_limit=None,
+                  s_selection='longest', a_counters=None):
     """
         This function clean the file then start by removing unwanted sequences that contain 
         (in lower or upper case) "sp", "cf" or "mitochondrion" in their name.
         Sequence names ending with "idae" are also removed. 
         Finally, if there are more than 3 sequences associated with the same species name 
         then only the 3 longest sequences are kept.
+        The length of a sequence is its number of bases (line endings are not counted)
+        and sequences of the same length are ranked with the tie breakers.
+        With the "consensus" selection the 3 sequences closest to the consensus of the
+        species are kept instead (see f_select_consensus).
 
         Args:
             s_path_filename: Absolute path to the file that will be processed
-            
+            l_tie_breakers: Names of the tie breakers, in order (see D_TIE_BREAKERS)
+            d_memory_limit: If given, maximum memory (in bytes) used to rank the sequences,
+                the file is then processed by f_update_file_external
+            s_selection: "longest" or "consensus" (see L_SELECTIONS)
+            a_counters: If given, row of SharedCounters where the progress is published
 
         Returns:
-            None
+            s_path_filename_updated: Path of the file with the kept sequences
+            s_path_filename_removed: Path of the file with the removed sequences
 
     """
 
-    # Read all the file
-    with open(s_path_filename, 'r') as f:
-        lines = f.readlines()
+    if d_memory_limit is not None:
+        # The consensus needs all the sequences of a species in memory
+        if s_selection != 'longest':
+            raise ValueError('the ' + s_selection + ' selection can not be used with a memory limit')
+        return f_update_file_external(s_path_filename, l_tie_breakers, d_memory_limit, a_counters)
 
-    # Clean list (remove potential extra empty line and be sure to have a empty line 
-    # before each sequence except the first one)
-    l_clean = []
+    d_time_start = time.perf_counter()
 
-    # First sequence
-    b_first_sequence = 1
+    # List of removed sequences
+    l_removed = []
 
-    for line in lines:
+    # Kept records with their new header and species name
+    l_kept = []
 
-        # Find the lines associated with the symbol '>' as a start
-        # If the symbol '>' is found then extract each group of "words"
-        if line[0] == '>':
+    # The records are filtered as soon as they are read
+    for d_count, record in enumerate(f_read_records(s_path_filename), 1):
 
-            if b_first_sequence == 1:
-                l_clean.append(line)
-                b_first_sequence = 0
+        if a_counters is not None and d_count % D_PUBLISH_EVERY == 0:
+            f_publish_counters(a_counters, d_time_start, records=d_count,
+                               bytes=record.offset + record.length)
 
-            else:
-                l_clean.append('\n')
-                l_clean.append(line)
+        s_new_header, s_name, b_keep = f_parse_header(record.header)
 
+        if b_keep == 1:
+            l_kept.append((s_new_header, s_name, record))
         else:
-            if not (line[0] == '\n') and b_first_sequence == 0:
-                l_clean.append(line)
+            l_removed.append((s_new_header, record))
 
-    l_clean.append('\n')
+    # Identify and only keep the 3 biggest (or closest to the consensus)
+    # sequences of each species
+    f_select = f_select_consensus if s_selection == 'consensus' else f_select_longest
+    l_trimmed = f_select([(s_name, record) for s_new_header, s_name, record in l_kept],
+                         l_tie_breakers=l_tie_breakers)
+    set_trimmed = set(l_trimmed)
 
-    # List of removed sequences
-    l_removed = []
+    # The trimmed sequences are added to the removed ones in the order of the file
+    for d_index in l_trimmed:
+        s_new_header, s_name, record = l_kept[d_index]
+        l_removed.append((s_new_header, record))
 
-    # Names and sequence size
-    l_names = []
-    l_seq_size = []
+    l_clean = []
+    for d_index, (s_new_header, s_name, record) in enumerate(l_kept):
+        if d_index not in set_trimmed:
+            l_clean.append((s_new_header, record))
 
-    # Index of names
-    l_index_names = []
+    s_path_filename_updated, s_path_filename_removed = f_output_paths(s_path_filename)
 
-    # Once the sequences format is cleaned then the selection can be performed
-    # Index of lines
-    d_line_number = -1
+    print('Creation of ' + s_path_filename_updated +
+          ' and ' + s_path_filename_removed)
+    for s_path_output, l_output in [(s_path_filename_updated, l_clean),
+                                    (s_path_filename_removed, l_removed)]:
+        with RecordWriter(s_path_output, s_path_filename) as writer:
+            for s_new_header, record in l_output:
+                writer.write(s_new_header, record)
 
-    while d_line_number < len(l_clean)-1:
-        d_line_number += 1
+    if a_counters is not None:
+        f_publish_counters(a_counters, d_time_start, records=len(l_removed) + len(l_clean),
+                           kept=len(l_clean), filtered=len(l_removed) - len(l_trimmed),
+                           trimmed=len(l_trimmed), bytes=os.path.getsize(s_path_filename))
 
-        line = l_clean[d_line_number]
+    return s_path_filename_updated, s_path_filename_removed
 
-        # If the symbol '>' is found then extract each group of "words"
-        if line[0] == '>':
 
-            if '_' in line:
-                words = line.split('_')
-                b_edited = 1
-            else:
-                words = line.split()
-                b_edited = 0
+def f_update_file_external(s_path_filename, l_tie_breakers=L_TIE_BREAKERS,
+                           d_memory_limit=256 * 1024 ** 2, a_counters=None):
+    """
+        Same processing as f_update_file for files whose sequences do not fit in memory.
+        1 - The file is read once: the removed sequences are written directly and the
+            ranking keys (species name, size, tie breakers, offset) of the other ones are
+            sorted by runs of at most d_memory_limit bytes written to temporary files.
+        2 - The runs are merged (f_merge_runs) to find the 3 longest sequences of each
+            species: only their offsets are kept in memory.
+        3 - The file is read again to write the kept sequences, the trimmed ones being
+            written to a temporary file then copied at the end of the removed sequences.
+        The created files are the same as with f_update_file.
 
-            # Test if one of the 2nd, 3rd or 4th word contain only "sp", "sp.", "cf" or "cf." (passing everything in lowercase for every tests)
-            # Boolean to decide if the squence is kept or not
-            b_keep = 1
+        Args:
+            s_path_filename: Absolute path to the file that will be processed
+            l_tie_breakers: Names of the tie breakers, in order (see D_TIE_BREAKERS)
+            d_memory_limit: Maximum memory (in bytes) used by the ranking keys of a run
+            a_counters: If given, row of SharedCounters where the progress is published
 
-            # Convert the words of interest in lowercase
-            list_lowercase = [x.lower() for x in words]  # [1:4]]
+        Returns:
+            s_path_filename_updated: Path of the file with the kept sequences
+            s_path_filename_removed: Path of the file with the removed sequences
 
-            words_to_check = ['sp.', 'sp', 'cf', 'cf.', 'mitochondrion', 'mitochondrion,', 'mitochondrion,\n']
-            if any(word in list_lowercase or words[1][-4:] == 'idae' for word in words_to_check):
-                b_keep = 0
+    """
 
+    s_path_filename_updated, s_path_filename_removed = f_output_paths(s_path_filename)
 
-            # if list_lowercase.count('sp.') > 0 \
-            #         or list_lowercase.count('sp') > 0 \
-            #         or list_lowercase.count('cf') > 0 \
-            #         or list_lowercase.count('cf.') > 0\
-            #         or list_lowercase.count('mitochondrion') > 0\
-            #         or list_lowercase.count('mitochondrion,') > 0\
-            #         or list_lowercase.count('mitochondrion,\n') > 0\
-            #         or words[1][-4::] == 'idae':
-            #     b_keep = 0
+    print('Creation of ' + s_path_filename_updated +
+          ' and ' + s_path_filename_removed)
 
-        if b_edited:
+    d_time_start = time.perf_counter()
+    d_records = 0
+    d_filtered = 0
 
-            # If the sequence is kept, the name and sequence size are saved
-            if b_keep == 1:
-                l_names.append(words)
+    # The runs are written next to the file, where there is room for the data
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(s_path_filename) or None) as s_path_tmp_dir:
 
-                l_clean[d_line_number] = '_'.join(words)
+        l_path_runs = []
+        l_keys = []
+        d_memory = 0
 
-                d_size_seq = 0
+        with RecordWriter(s_path_filename_removed, s_path_filename) as w_removed:
 
-                l_index_names.append(d_line_number)
+            for record in f_read_records(s_path_filename):
+                d_records += 1
+                if a_counters is not None and d_records % D_PUBLISH_EVERY == 0:
+                    f_publish_counters(a_counters, d_time_start, records=d_records,
+                                       bytes=record.offset + record.length)
 
-                while l_clean[d_line_number] != '\n':
-                    d_line_number += 1
-                    d_size_seq += len(l_clean[d_line_number])
+                s_new_header, s_name, b_keep = f_parse_header(record.header)
 
-                l_seq_size.append(d_size_seq)
+                if b_keep == 1:
+                    l_keys.append(f_rank_key(s_name, record, l_tie_breakers, record.offset))
+                    d_memory += D_KEY_MEMORY + len(s_name)
+                    if d_memory > d_memory_limit:
+                        l_path_runs.append(f_write_run(s_path_tmp_dir, l_keys))
+                        l_keys = []
+                        d_memory = 0
+                else:
+                    d_filtered += 1
+                    w_removed.write(s_new_header, record)
 
-            # Else the sequence is removed and save in the removed list
-            else:
+            if l_keys:
+                l_path_runs.append(f_write_run(s_path_tmp_dir, l_keys))
+                l_keys = []
 
-                l_removed.append('_'.join(words))
+            # Offsets of the kept sequences
+            set_kept = set(-key[-1] for key, b_keep in f_walk_ranked(
+                f_merge_runs(s_path_tmp_dir, l_path_runs), D_SEQ_TO_KEEP) if b_keep)
 
-                while l_clean[d_line_number] != '\n':
-                    del l_clean[d_line_number]
-                    l_removed.append(l_clean[d_line_number])
+            # The trimmed sequences are added to the removed ones in the order of the file
+            s_path_trimmed = os.path.join(s_path_tmp_dir, 'trimmed.fasta')
+            with RecordWriter(s_path_filename_updated, s_path_filename) as w_updated, \
+                    RecordWriter(s_path_trimmed, s_path_filename) as w_trimmed:
+                for record in f_read_records(s_path_filename):
+                    s_new_header, s_name, b_keep = f_parse_header(record.header)
+                    if record.offset in set_kept:
+                        w_updated.write(s_new_header, record)
+                    elif b_keep == 1:
+                        w_trimmed.write(s_new_header, record)
 
-                del l_clean[d_line_number]
+            w_removed.write_file(s_path_trimmed)
 
-                d_line_number -= 1
+    if a_counters is not None:
+        f_publish_counters(a_counters, d_time_start, records=d_records, kept=len(set_kept),
+                           filtered=d_filtered, trimmed=d_records - d_filtered - len(set_kept),
+                           bytes=os.path.getsize(s_path_filename))
 
-        else:
-            # If the sequence is kept, the name and sequence size are saved
-            if b_keep == 1:
-                l_names.append(words)
+    return s_path_filename_updated, s_path_filename_removed
 
-                if len(words) == 4:
-                    l_clean[d_line_number] = '_'.join(
-                        [words[0][:-2], words[1], words[2], words[3]]) + '\n'
 
-                    d_size_seq = 0
+def f_write_run(s_path_tmp_dir, keys):
+    """
+        Sort ranking keys (see f_rank_key) and write them to a temporary file.
 
-                    l_index_names.append(d_line_number)
+        Args:
+            s_path_tmp_dir: Folder of the temporary files
+            keys: List of ranking keys, sorted in place, or iterable of ranking keys
+                already sorted (written as they come)
 
-                    while l_clean[d_line_number] != '\n':
-                        d_line_number += 1
-                        d_size_seq += len(l_clean[d_line_number])
+        Returns:
+            Path of the temporary file
 
-                    l_seq_size.append(d_size_seq)
+    """
 
-                else:
-                    l_clean[d_line_number] = '_'.join(
-                        [words[0], words[1], words[2]]) + '\n'
+    if isinstance(keys, list):
+        keys.sort()
 
-                    d_size_seq = 0
+    d_fd, s_path_run = tempfile.mkstemp(suffix='.run', dir=s_path_tmp_dir)
+    with os.fdopen(d_fd, 'wb') as f:
+        pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+        for key in keys:
+            pickler.dump(key)
 
-                    l_index_names.append(d_line_number)
+    return s_path_run
 
-                    while l_clean[d_line_number] != '\n':
-                        d_line_number += 1
-                        d_size_seq += len(l_clean[d_line_number])
 
-                    l_seq_size.append(d_size_seq)
+def f_read_run(s_path_run):
+    """
+        Read the ranking keys written by f_write_run, one at a time.
+
+        Args:
+            s_path_run: Path of the temporary file
+
+        Returns:
+            Generator of ranking keys, sorted
+
+    """
+
+    with open(s_path_run, 'rb') as f:
+        unpickler = pickle.Unpickler(f)
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                return
+
+
+def f_merge_runs(s_path_tmp_dir, l_path_runs, d_fan_in=D_MERGE_FAN_IN):
+    """
+        Merge the runs written by f_write_run.
+        At most d_fan_in runs are open at the same time: while there are more runs, they
+        are merged by groups of d_fan_in into new runs (the merged runs are deleted).
+
+        Args:
+            s_path_tmp_dir: Folder of the temporary files
+            l_path_runs: Paths of the runs
+            d_fan_in: Maximum number of runs merged at once
+
+        Returns:
+            Generator of ranking keys, sorted
+
+    """
+
+    while len(l_path_runs) > d_fan_in:
+        l_path_merged = []
+        for d_start in range(0, len(l_path_runs), d_fan_in):
+            l_group = l_path_runs[d_start:d_start + d_fan_in]
+            if len(l_group) == 1:
+                l_path_merged.append(l_group[0])
+                continue
+            l_path_merged.append(f_write_run(
+                s_path_tmp_dir, heapq.merge(*[f_read_run(s_path_run) for s_path_run in l_group])))
+            for s_path_run in l_group:
+                os.remove(s_path_run)
+        l_path_runs = l_path_merged
+
+    return heapq.merge(*[f_read_run(s_path_run) for s_path_run in l_path_runs])
+
+
+def f_output_paths(s_path_filename):
+    """
+        Paths of the files created by f_update_file for a FASTA file.
+
+        Args:
+            s_path_filename: Absolute path to the processed file
+
+        Returns:
+            s_path_filename_updated: Path of the file with the kept sequences
+            s_path_filename_removed: Path of the file with the removed sequences
+
+    """
 
-            # Else the sequence is removed and save in the removed list
-            else:
+    s_path_root = os.path.splitext(s_path_filename)[0]
+    return s_path_root + '_trimmed' + '.fasta', s_path_root + '_removed' + '.fasta'
 
-                if len(words) == 4:
-                    l_removed.append(
-                        '_'.join([words[0][:-2], words[1], words[2], words[3]]) + '\n')
 
+def f_copy_range(d_fd_in, d_fd_out, d_offset, d_count):
+    """
+        Copy bytes of a file at the current position of another one, inside the kernel
+        when possible (os.copy_file_range, then os.sendfile), otherwise by reading and
+        writing the bytes.
+
+        Args:
+            d_fd_in: File descriptor of the input file
+            d_fd_out: File descriptor of the output file
+            d_offset: Offset of the first byte to copy in the input file
+            d_count: Number of bytes to copy
+
+        Returns:
+            None
+
+    """
+
+    for s_function in ['copy_file_range', 'sendfile']:
+        if not hasattr(os, s_function) or d_count == 0:
+            continue
+        try:
+            while d_count > 0:
+                if s_function == 'copy_file_range':
+                    d_copied = os.copy_file_range(d_fd_in, d_fd_out, d_count, d_offset)
                 else:
-                    l_removed.append(
-                        '_'.join([words[0], words[1], words[2]]) + '\n')
+                    d_copied = os.sendfile(d_fd_out, d_fd_in, d_offset, d_count)
+                if d_copied == 0:
+                    break
+                d_offset += d_copied
+                d_count -= d_copied
+        except OSError:
+            # Not supported between these files (file system, platform): try the next way
+            continue
+        if d_count == 0:
+            return
+
+    # os.pread does not exist on Windows
+    os.lseek(d_fd_in, d_offset, os.SEEK_SET)
+    while d_count > 0:
+        data = os.read(d_fd_in, min(d_count, D_WRITE_BUFFER))
+        if not data:
+            raise IOError('unexpected end of file while copying a record')
+        d_count -= len(data)
+        while data:
+            data = data[os.write(d_fd_out, data):]
+
+
+class RecordWriter:
+    """
+        Write records to an output file in binary mode.
+        A record whose bytes in the input file are already the ones of the output
+        (edited header, see FastaRecord.verbatim) is copied from the input file without
+        being rebuilt, consecutive records being copied at once (f_copy_range); the other
+        records are formatted (f_format_record) and written by blocks of D_WRITE_BUFFER
+        bytes.
+        The file is written to a temporary file renamed when the writer is closed, so that
+        an interrupted run never leaves a partially written output file (the temporary
+        file does not end with ".fasta" and is not taken as an input).
+        The data is not synchronised to disk here: f_checkpoint_journal does it for a
+        batch of files.
+
+        Usage:
+            with RecordWriter(s_path_filename, s_path_input) as writer:
+                writer.write(s_new_header, record)
+
+    """
+
+    def __init__(self, s_path_filename, s_path_input):
+        self.s_path_filename = s_path_filename
+        self.s_path_tmp = s_path_filename + S_TMP_SUFFIX
+        self.d_fd_in = os.open(s_path_input, os.O_RDONLY | D_O_BINARY)
+        self.d_fd_out = os.open(self.s_path_tmp,
+                                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | D_O_BINARY, 0o666)
+
+        # Formatted records waiting to be written
+        self.l_buffer = []
+        self.d_buffer = 0
+
+        # Range of the input file waiting to be copied [start, end[ (None if there is none)
+        self.d_range_start = None
+        self.d_range_end = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(b_keep=exc_type is None)
+
+    def write(self, s_new_header, record):
+        if record.verbatim and s_new_header == record.header:
+            if record.offset != self.d_range_end:
+                self.flush_range()
+                self.flush_buffer()
+                self.d_range_start = record.offset
+            self.d_range_end = record.offset + record.length
+        else:
+            self.flush_range()
+            data = ''.join(f_format_record(s_new_header, record.lines)).encode()
+            self.l_buffer.append(data)
+            self.d_buffer += len(data)
+            if self.d_buffer >= D_WRITE_BUFFER:
+                self.flush_buffer()
+
+    def write_file(self, s_path_filename):
+        # Copy a whole file (written by another RecordWriter) after the records
+        self.flush_range()
+        self.flush_buffer()
+        d_fd = os.open(s_path_filename, os.O_RDONLY | D_O_BINARY)
+        try:
+            f_copy_range(d_fd, self.d_fd_out, 0, os.fstat(d_fd).st_size)
+        finally:
+            os.close(d_fd)
+
+    def flush_range(self):
+        if self.d_range_end is not None:
+            f_copy_range(self.d_fd_in, self.d_fd_out, self.d_range_start,
+                         self.d_range_end - self.d_range_start)
+        self.d_range_start = self.d_range_end = None
+
+    def flush_buffer(self):
+        data = b''.join(self.l_buffer)
+        while data:
+            data = data[os.write(self.d_fd_out, data):]
+        self.l_buffer = []
+        self.d_buffer = 0
+
+    def close(self, b_keep=True):
+        try:
+            if b_keep:
+                self.flush_range()
+                self.flush_buffer()
+        finally:
+            os.close(self.d_fd_in)
+            os.close(self.d_fd_out)
+
+        if b_keep:
+            os.replace(self.s_path_tmp, self.s_path_filename)
+        else:
+            os.remove(self.s_path_tmp)
+
+
+def f_journal_entry(s_path_filename):
+    """
+        Line of the journal identifying a processed file: name, size and modification
+        time, so that a file modified since it was processed is processed again.
+
+        Args:
+            s_path_filename: Absolute path to the processed file
+
+        Returns:
+            Line of the journal (without line ending)
+
+    """
+
+    stat = os.stat(s_path_filename)
+    return '\t'.join([os.path.basename(s_path_filename), str(stat.st_size), str(stat.st_mtime_ns)])
+
+
+def f_read_journal(s_path_journal):
+    """
+        Read the journal of an interrupted batch.
+        A last line cut by the interruption does not match any file and is ignored.
+
+        Args:
+            s_path_journal: Path of the journal
+
+        Returns:
+            Set of the lines of the journal (without line endings)
+
+    """
+
+    if not os.path.isfile(s_path_journal):
+        return set()
+
+    with open(s_path_journal, 'r') as f:
+        return set(line.rstrip('\n') for line in f)
+
+
+def f_checkpoint_journal(s_path_journal, l_entries, l_paths_created):
+    """
+        Synchronise to disk the files created since the last checkpoint and the folders
+        containing them (the outputs are renamed into place, see RecordWriter), then
+        record the processed files in the journal and synchronise it.
+        Doing it for a batch of files keeps the number of fsync calls low, and a file is
+        only recorded once its outputs are safely on disk.
+
+        Args:
+            s_path_journal: Path of the journal
+            l_entries: Lines of the journal to add (see f_journal_entry)
+            l_paths_created: Paths of the files created since the last checkpoint
+
+        Returns:
+            None
+
+    """
+
+    # A rename is only durable once the folder itself is synchronised
+    s_folder_journal = os.path.dirname(os.path.abspath(s_path_journal))
+    set_folders = set(os.path.dirname(os.path.abspath(s_path)) for s_path in l_paths_created)
+    b_new_journal = not os.path.isfile(s_path_journal)
+    if b_new_journal:
+        set_folders.discard(s_folder_journal)
+
+    for s_path in l_paths_created:
+        f_fsync_path(s_path)
+    for s_folder in sorted(set_folders):
+        f_fsync_path(s_folder, b_folder=1)
+
+    with open(s_path_journal, 'a') as f:
+        f.writelines(s_entry + '\n' for s_entry in l_entries)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # The folder of the journal is synchronised after the journal is created in it
+    if b_new_journal:
+        f_fsync_path(s_folder_journal, b_folder=1)
+
+
+def f_fsync_path(s_path, b_folder=0):
+    """
+        Synchronise a file or a folder to disk.
+        A folder can not be opened on Windows: it is not synchronised there (only
+        the files are).
+
+        Args:
+            s_path: Path of the file or folder
+            b_folder: 1 if s_path is a folder, 0 otherwise
+
+        Returns:
+            None
+
+    """
+
+    if b_folder and os.name == 'nt':
+        return
+
+    # On Windows a file must be opened for writing to be synchronised
+    d_fd = os.open(s_path, (os.O_RDWR if os.name == 'nt' else os.O_RDONLY) | D_O_BINARY)
+    try:
+        os.fsync(d_fd)
+    finally:
+        os.close(d_fd)
+
+
+def f_dry_run(s_path_filename, d_seq_to_keep=D_SEQ_TO_KEEP):
+    """
+        Count, without writing any file, how many sequences of each species would be
+        kept and removed by f_update_file.
+        Only the headers are read (f_scan_headers): the number of sequences kept for a
+        species does not depend on the sequences themselves.
+
+        Args:
+            s_path_filename: Absolute path to the file that will be processed
+            d_seq_to_keep: Number of sequences kept for each species
+
+        Returns:
+            Dictionary {species name: [number kept, number removed]}
+
+    """
+
+    d_species = {}
+    for s_header in f_scan_headers(s_path_filename):
+        s_new_header, s_name, b_keep = f_parse_header(s_header)
+        l_count = d_species.setdefault(s_name, [0, 0])
+        if b_keep == 1 and l_count[0] < d_seq_to_keep:
+            l_count[0] += 1
+        else:
+            l_count[1] += 1
+
+    return d_species
+
+
+def f_report_dry_run(s_filename, d_species):
+    """
+        Lines of text summarising the result of f_dry_run for a file.
+
+        Args:
+            s_filename: Name of the file displayed in the report
+            d_species: Result of f_dry_run
+
+        Returns:
+            List of lines (without line endings)
+
+    """
 
-                while l_clean[d_line_number] != '\n':
-                    del l_clean[d_line_number]
-                    l_removed.append(l_clean[d_line_number])
+    d_kept = sum(l_count[0] for l_count in d_species.values())
+    d_removed = sum(l_count[1] for l_count in d_species.values())
 
-                del l_clean[d_line_number]
+    l_report = [s_filename + ': ' + str(d_kept) + ' kept, ' + str(d_removed) + ' removed']
+    for s_name in sorted(d_species):
+        l_report.append('    ' + s_name + ': ' + str(d_species[s_name][0]) + ' kept, ' +
+                        str(d_species[s_name][1]) + ' removed')
 
-                d_line_number -= 1
+    return l_report
 
+
+def f_reference_header(s_header):
+    """
+        Header parser of f_reference_selection, written again from the original script
+        (and not shared with f_parse_header) so that an error of the parser of the
+        engines is found by the check.
+
+        Args:
+            s_header: Header of the sequence, starting with '>' and without line ending
+
+        Returns:
+            s_new_header: Header written in the output files (without line ending)
+            s_name: Species name used to group the sequences
+            b_keep: 1 if the sequence is kept, 0 otherwise
+            d_version: Version of the accession number, 0 if there is none
+
+    """
+
+    # Edited headers (more "_" than spaces) are split on "_", raw headers on spaces
+    b_edited = s_header.count('_') > s_header.count(' ')
     if b_edited:
-        # Process and identify the name that are present more than 3 times
-        l_aux_names = []
-        for name in l_names:
-            l_aux_names.append('_'.join(name[-3:-1]))
-
-        # Only keep different names
-        l_unique_names = list(set(l_aux_names))
-
-        # For each name count how many examples they are
-        l_count_names = []
-        for name in l_unique_names:
-            l_count_names.append(l_aux_names.count(name))
-
-        # Identify the one that are more than 3 examples:
-        l_redondant_seq = []
-        l_number_of_seq = []
-
-        # Number of sequence to keep
-        d_seq_to_keep = 3
-
-        # Auxiliary sequence (removing sequences by inserting a unique sequences to preserve the previous indexation)
-        l_aux_clean = list(l_clean)
-
-        # Better "pythonic way" to code this (should be changed)
-        d_count = -1
-        for d_size in l_count_names:
-            d_count += 1
-            if d_size > d_seq_to_keep:
-                l_redondant_seq.append(l_unique_names[d_count])
-                l_number_of_seq.append(l_count_names[d_count])
-
-        # Identify and only keep the 3 biggest sequences
-        # <=> removing the smallest sequences until there are 3 left
-        for redondant_name in l_redondant_seq:
-            d_count = -1
-            l_aux_size_seq = []
-            l_aux_index_seq = []
-            for name in l_aux_names:
-                d_count += 1
-                if name == redondant_name:
-                    l_aux_size_seq.append(l_seq_size[d_count])
-                    l_aux_index_seq.append(d_count)
-
-            # Identify the sequences that need to be removed
-            while len(l_aux_size_seq) > d_seq_to_keep:
-
-                d_index_line = l_index_names[l_aux_index_seq[np.argmin(
-                    l_aux_size_seq)]]
-
-                for d_aux_index_line in range(d_index_line, l_index_names[np.min([l_aux_index_seq[np.argmin(l_aux_size_seq)]+1, len(l_index_names)-1])]):
-
-                    l_removed.append(l_clean[d_aux_index_line])
-
-                    # Choose a special series of characters to remove later
-                    l_aux_clean[d_aux_index_line] = '$!@'
-
-                del l_aux_index_seq[np.argmin(l_aux_size_seq)]
-                del l_aux_size_seq[np.argmin(l_aux_size_seq)]
-
-        d_count = -1
-        for line in l_aux_clean:
-            d_count += 1
-            if line == '$!@':
-                del l_clean[d_count]
-                d_count -= 1
-
-        s_path_filename_updated = s_path_filename[:-6] + '_trimmed' + '.fasta'
-        s_path_filename_removed = s_path_filename[:-6] + '_removed' + '.fasta'
-
-        print('Creation of ' + s_path_filename_updated +
-              ' and ' + s_path_filename_removed)
-        with open(s_path_filename_updated, 'w') as f:
-            f.writelines(l_clean)
-
-        with open(s_path_filename_removed, 'w') as f:
-            f.writelines(l_removed)
+        words = s_header.split('_')
+    else:
+        words = s_header.split()
+
+    words_to_check = ['sp.', 'sp', 'cf', 'cf.', 'mitochondrion', 'mitochondrion,']
+    list_lowercase = [x.lower() for x in words]
+    b_keep = 1
+    for word in words_to_check:
+        if word in list_lowercase:
+            b_keep = 0
+    if len(words) > 1 and words[1].endswith('idae'):
+        b_keep = 0
 
+    if b_edited:
+        s_new_header = s_header
+        s_name = '_'.join(words[-3:-1])
     else:
+        if len(words) == 4:
+            s_new_header = '_'.join([words[0][:-2], words[1], words[2], words[3]])
+        else:
+            s_new_header = '_'.join(words[:3])
+        s_name = '_'.join(words[1:3])
+
+    # ">HQ932670.2 ..." -> "HQ932670.2" -> "2" (RefSeq accessions contain a "_": "NC_012345.2")
+    s_accession = (s_header[1:].split() or [''])[0]
+    s_version = s_accession.partition('.')[2]
+    d_digits = len(s_version) - len(s_version.lstrip('0123456789'))
+    d_version = int(s_version[:d_digits]) if d_digits else 0
+
+    return s_new_header, s_name, b_keep, d_version
+
+
+def f_reference_selection(s_path_filename, l_tie_breakers=L_TIE_BREAKERS, d_seq_to_keep=3):
+    """
+        Reference implementation of f_update_file used to check the other engines
+        (see f_check_file): the file is read line by line as text, each record is
+        rebuilt as a single string and the sequences of each species are sorted from the
+        smallest to the longest. It is written to be simple, not fast, and shares no
+        code with the engines (see f_reference_header).
+
+        Args:
+            s_path_filename: Absolute path to the file that will be processed
+            l_tie_breakers: Names of the tie breakers, in order (see D_TIE_BREAKERS)
+            d_seq_to_keep: Number of sequences kept for each species
+
+        Returns:
+            l_clean: List of (header, sequence) of the kept sequences
+            l_removed: List of (header, sequence) of the removed sequences
+            d_species: Dictionary {species name: [number kept, number removed]}
+                (as f_dry_run)
+
+    """
+
+    with open(s_path_filename, 'r', newline='') as f:
+        lines = f.read().splitlines()
+
+    # Records as [header, sequence]
+    l_records = []
+    for line in lines:
+        if line[:1] == '>':
+            l_records.append([line.rstrip(), ''])
+        elif l_records:
+            l_records[-1][1] += line.strip()
+
+    l_removed = []
+    # Kept sequences as (new header, species name, sequence, values of the tie breakers)
+    l_kept = []
+    d_species = {}
+    for s_header, s_seq in l_records:
+        s_new_header, s_name, b_keep, d_version = f_reference_header(s_header)
+        d_species.setdefault(s_name, [0, 0])[1] += 1
+        if b_keep == 1:
+            # The worst sequence has the lowest values: more ambiguous bases, older version
+            d_ties = {'ambiguous': -len([c for c in s_seq if c not in 'ACGTacgt']),
+                      'version': d_version}
+            l_kept.append((s_new_header, s_name, s_seq,
+                           tuple(d_ties[s_tie] for s_tie in l_tie_breakers)))
+        else:
+            l_removed.append((s_new_header, s_seq))
+
+    # Sequences of each species from the smallest (then the worst for the tie breakers,
+    # then the first one) to the longest: all but the 3 last ones are removed
+    d_index_names = {}
+    for d_index, (s_new_header, s_name, s_seq, ties) in enumerate(l_kept):
+        d_index_names.setdefault(s_name, []).append(d_index)
+
+    set_trimmed = set()
+    for s_name, l_aux_index_seq in d_index_names.items():
+        l_aux_index_seq = sorted(l_aux_index_seq, key=lambda i: (
+            (len(l_kept[i][2]),) + l_kept[i][3] + (i,)))
+        set_trimmed.update(l_aux_index_seq[:-d_seq_to_keep])
+
+    l_clean = []
+    for d_index, (s_new_header, s_name, s_seq, ties) in enumerate(l_kept):
+        if d_index in set_trimmed:
+            continue
+        l_clean.append((s_new_header, s_seq))
+        d_species[s_name][0] += 1
+        d_species[s_name][1] -= 1
+    for d_index in sorted(set_trimmed):
+        s_new_header, s_name, s_seq, ties = l_kept[d_index]
+        l_removed.append((s_new_header, s_seq))
+
+    return l_clean, l_removed, d_species
+
+
+def f_check_file(s_path_filename, l_tie_breakers=L_TIE_BREAKERS, d_memory_limit=64 * 1024,
+                 s_selection='longest', d_jobs=1):
+    """
+        Check that every engine selects the same sequences as f_reference_selection,
+        and time them. The file is copied to a temporary folder where it is processed:
+        - "memory": by f_update_file in memory, with the s_selection selection
+        - "external": by f_update_file_external (the default memory limit is small so
+          that several runs are merged), only for the "longest" selection
+        - "jobs": by f_run_files in d_jobs worker processes, when d_jobs > 1
+        - "verbatim": the file created by the "memory" engine is processed again, its
+          records being copied as they are (see RecordWriter)
+        and the counts of f_dry_run are compared too.
+        The reference only implements the "longest" selection: the sequences kept with
+        the "consensus" selection are only checked to be as many as the reference ones,
+        and kept and removed sequences to be the same as the reference ones together.
+        Nothing is written in the folder of the file.
+
+        Args:
+            s_path_filename: Absolute path to the file that will be checked
+            l_tie_breakers: Names of the tie breakers, in order (see D_TIE_BREAKERS)
+            d_memory_limit: Memory limit (in bytes) used for f_update_file_external
+            s_selection: "longest" or "consensus" (see L_SELECTIONS)
+            d_jobs: Number of worker processes of the "jobs" engine
+
+        Returns:
+            b_ok: 1 if all the engines agree with the reference, 0 otherwise
+            l_report: Lines of text describing the result (without line endings)
+
+    """
+
+    s_filename = os.path.basename(s_path_filename)
+    l_report = []
+    b_ok = 1
+
+    d_time = time.perf_counter()
+    l_clean, l_removed, d_species = f_reference_selection(s_path_filename, l_tie_breakers)
+    d_time_reference = time.perf_counter() - d_time
+
+    def f_compare(s_engine, l_paths, l_expected, s_selection):
+        # Compare the files created by an engine with the sequences of the reference
+        l_outputs = [[(record.header, ''.join(record.lines))
+                      for record in f_read_records(s_path)] for s_path in l_paths]
+        if s_selection == 'longest':
+            b_same = l_outputs == l_expected
+        else:
+            b_same = len(l_outputs[0]) == len(l_expected[0]) and \
+                sorted(l_outputs[0] + l_outputs[1]) == sorted(l_expected[0] + l_expected[1])
+        if not b_same:
+            l_report.append('    ' + s_engine + ': the selected sequences differ from the reference')
+        return b_same
+
+    with tempfile.TemporaryDirectory() as s_path_tmp_dir:
+        s_path_copy = os.path.join(s_path_tmp_dir, s_filename)
+        shutil.copyfile(s_path_filename, s_path_copy)
+
+        l_engines = [('memory', None)]
+        if s_selection == 'longest':
+            l_engines.append(('external', d_memory_limit))
+
+        d_engines = {}
+        for s_engine, d_limit in l_engines:
+            d_time = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                l_paths = f_update_file(s_path_copy, l_tie_breakers, d_limit, s_selection)
+            d_engines[s_engine] = time.perf_counter() - d_time
+            b_ok &= f_compare(s_engine, l_paths, [l_clean, l_removed], s_selection)
+
+            if s_engine == 'memory':
+                # The created file is processed again below (verbatim records)
+                s_path_verbatim = os.path.join(s_path_tmp_dir, 'verbatim_' + s_filename)
+                shutil.copyfile(l_paths[0], s_path_verbatim)
+
+        if d_jobs > 1:
+            counters = SharedCounters(1)
+            try:
+                d_time = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    f_run_files([s_path_copy], counters, d_jobs,
+                                {'l_tie_breakers': l_tie_breakers, 's_selection': s_selection})
+                d_engines['jobs'] = time.perf_counter() - d_time
+            finally:
+                counters.close()
+                counters.unlink()
+            b_ok &= f_compare('jobs', f_output_paths(s_path_copy), [l_clean, l_removed], s_selection)
+
+        d_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            l_paths = f_update_file(s_path_verbatim, l_tie_breakers)
+        d_engines['verbatim'] = time.perf_counter() - d_time
+        l_clean_verbatim, l_removed_verbatim, d_species_verbatim = f_reference_selection(
+            s_path_verbatim, l_tie_breakers)
+        b_ok &= f_compare('verbatim', l_paths, [l_clean_verbatim, l_removed_verbatim], 'longest')
+
+        d_time = time.perf_counter()
+        d_species_dry_run = f_dry_run(s_path_copy)
+        d_engines['dry run'] = time.perf_counter() - d_time
+
+        if d_species_dry_run != d_species:
+            b_ok = 0
+            l_report.append('    dry run: the counts differ from the reference')
+
+    l_report.insert(0, s_filename + ': ' + ('OK' if b_ok else 'MISMATCH') +
+                    ' (reference ' + '%.3f s' % d_time_reference + ', ' +
+                    ', '.join(s_engine + ' %.3f s' % d_engine for s_engine, d_engine in d_engines.items()) +
+                    ')')
+
+    return b_ok, l_report
+
+
+def f_publish_counters(a_counters, d_time_start, **d_values):
+    """
+        Publish the progress of a file in its row of SharedCounters.
+        Only the given counters (see L_COUNTERS) are changed, and the seconds since
+        d_time_start are updated.
+
+        Args:
+            a_counters: Row of SharedCounters of the file
+            d_time_start: Time (time.perf_counter) at which the processing started
+            d_values: New values of the counters, by name
+
+        Returns:
+            None
+
+    """
+
+    for s_counter, d_value in d_values.items():
+        a_counters[L_COUNTERS.index(s_counter)] = d_value
+    a_counters[L_COUNTERS.index('seconds')] = time.perf_counter() - d_time_start
+
+
+class SharedCounters:
+    """
+        Counters of the files of a batch (one row per file, one column per name of
+        L_COUNTERS) stored in a multiprocessing.shared_memory block, so that the worker
+        processes publish their progress without sending any message and the CLI or the
+        GUI read it at any time.
+        The process creating the counters must call close() then unlink(), the workers
+        attach to them with the name of the block.
+
+        Usage:
+            counters = SharedCounters(d_files)
+            counters.array[d_index, L_COUNTERS.index('kept')]
+
+    """
+
+    def __init__(self, d_files, s_name=None):
+        d_size = max(d_files, 1) * len(L_COUNTERS) * np.dtype(np.float64).itemsize
+        if s_name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=d_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=s_name)
+        self.array = np.ndarray((d_files, len(L_COUNTERS)), dtype=np.float64, buffer=self.shm.buf)
+        if s_name is None:
+            self.array[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # The array must be released before the shared memory block
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# Counters of the batch in a worker process (see f_init_worker)
+WORKER_COUNTERS = None
+
+
+def f_init_worker(s_name, d_files):
+    """
+        Attach a worker process to the counters of the batch.
+
+        Args:
+            s_name: Name of the shared memory block of SharedCounters
+            d_files: Number of files of the batch
+
+        Returns:
+            None
+
+    """
+
+    global WORKER_COUNTERS
+    WORKER_COUNTERS = SharedCounters(d_files, s_name)
+
+
+def f_process_file(a_counters, s_path_filename, d_kwargs):
+    """
+        Process a file with f_update_file and publish its state in its counters.
+
+        Args:
+            a_counters: Row of SharedCounters of the file
+            s_path_filename: Absolute path to the file that will be processed
+            d_kwargs: Other arguments of f_update_file
+
+        Returns:
+            Paths of the created files (see f_update_file)
+
+    """
+
+    a_counters[L_COUNTERS.index('state')] = D_STATE_RUNNING
+    try:
+        l_paths = f_update_file(s_path_filename, a_counters=a_counters, **d_kwargs)
+    except BaseException:
+        a_counters[L_COUNTERS.index('state')] = D_STATE_FAILED
+        raise
+    a_counters[L_COUNTERS.index('state')] = D_STATE_DONE
+    return l_paths
 
-        # Process and identify the name that are present more than 3 times
-        l_aux_names = []
-        for name in l_names:
-            l_aux_names.append('_'.join(name[1:3]))
 
-        # Only keep different names
-        l_unique_names = list(set(l_aux_names))
+def f_process_worker(d_index, s_path_filename, d_kwargs):
+    """
+        Process a file in a worker process (see f_run_files), the messages printed by
+        f_update_file being replaced by the counters.
+
+        Args:
+            d_index: Index of the file in the batch (row of the counters)
+            s_path_filename: Absolute path to the file that will be processed
+            d_kwargs: Other arguments of f_update_file
+
+        Returns:
+            Paths of the created files (see f_update_file)
 
-        # For each name count how many examples they are
-        l_count_names = []
-        for name in l_unique_names:
-            l_count_names.append(l_aux_names.count(name))
+    """
 
-        # Identify the one that are more than 3 examples:
-        l_redondant_seq = []
-        l_number_of_seq = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        return f_process_file(WORKER_COUNTERS.array[d_index], s_path_filename, d_kwargs)
 
-        # Number of sequence to keep
-        d_seq_to_keep = 3
 
-        # Auxiliary sequence (removing sequences by inserting a unique sequences to preserve the previous indexation)
-        l_aux_clean = list(l_clean)
+def f_run_files(l_path_filenames, counters, d_jobs=1, d_kwargs=None, f_on_done=None,
+                f_poll=None):
+    """
+        Process files with f_update_file, in d_jobs worker processes when d_jobs > 1.
+        The workers are started with the "spawn" method on every platform, so that
+        f_run_files can also be called from a thread of the GUI.
+        Each file publishes its progress in its row of counters: f_poll is called with the
+        counters array every D_POLL_INTERVAL seconds (and once at the end) so that it can
+        be displayed while the files are processed.
 
-        # Better "pythonic way" to code this (should be changed)
-        d_count = -1
-        for d_size in l_count_names:
-            d_count += 1
-            if d_size > d_seq_to_keep:
-                l_redondant_seq.append(l_unique_names[d_count])
-                l_number_of_seq.append(l_count_names[d_count])
+        Args:
+            l_path_filenames: Absolute paths to the files that will be processed
+            counters: SharedCounters with one row per file
+            d_jobs: Number of files processed at the same time
+            d_kwargs: Other arguments of f_update_file
+            f_on_done: If given, called with (index of the file, paths of the created files)
+                when a file is processed, in the process calling f_run_files
+            f_poll: If given, called with the counters array to display the progress
 
-        # Identify and only keep the 3 biggest sequences
-        # <=> removing the smallest sequences until there are 3 left
-        for redondant_name in l_redondant_seq:
-            d_count = -1
-            l_aux_size_seq = []
-            l_aux_index_seq = []
-            for name in l_aux_names:
-                d_count += 1
-                if name == redondant_name:
-                    l_aux_size_seq.append(l_seq_size[d_count])
-                    l_aux_index_seq.append(d_count)
+        Returns:
+            None
 
-            # Identify the sequences that need to be removed
-            while len(l_aux_size_seq) > d_seq_to_keep:
+    """
 
-                d_index_line = l_index_names[l_aux_index_seq[np.argmin(
-                    l_aux_size_seq)]]
+    d_kwargs = d_kwargs or {}
+
+    if d_jobs <= 1:
+        for d_index, s_path_filename in enumerate(l_path_filenames):
+            print('Processing ' + os.path.basename(s_path_filename))
+            l_paths = f_process_file(counters.array[d_index], s_path_filename, d_kwargs)
+            if f_on_done is not None:
+                f_on_done(d_index, l_paths)
+        if f_poll is not None:
+            f_poll(counters.array)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=d_jobs, mp_context=multiprocessing.get_context('spawn'),
+            initializer=f_init_worker,
+            initargs=(counters.name, len(l_path_filenames))) as executor:
+
+        d_futures = {executor.submit(f_process_worker, d_index, s_path_filename, d_kwargs): d_index
+                     for d_index, s_path_filename in enumerate(l_path_filenames)}
+
+        set_pending = set(d_futures)
+        while set_pending:
+            set_done, set_pending = concurrent.futures.wait(
+                set_pending, timeout=D_POLL_INTERVAL,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in sorted(set_done, key=d_futures.get):
+                l_paths = future.result()
+                if f_on_done is not None:
+                    f_on_done(d_futures[future], l_paths)
+            if f_poll is not None:
+                f_poll(counters.array)
+
+
+def f_report_counters(l_filenames, a_counters, d_size, b_active_only=False):
+    """
+        Lines of a table summarising the counters of a batch, with a total line giving
+        the overall progress (bytes read over the size of the files).
 
-                for d_aux_index_line in range(d_index_line, l_index_names[np.min([l_aux_index_seq[np.argmin(l_aux_size_seq)]+1, len(l_index_names)-1])]):
+        Args:
+            l_filenames: Names of the files of the batch
+            a_counters: Array of SharedCounters
+            d_size: Total size (in bytes) of the files of the batch
+            b_active_only: Only list the files being processed or failed
 
-                    l_removed.append(l_clean[d_aux_index_line])
+        Returns:
+            List of lines (without line endings)
 
-                    # Choose a special series of characters to remove later
-                    l_aux_clean[d_aux_index_line] = '$!@'
+    """
 
-                del l_aux_index_seq[np.argmin(l_aux_size_seq)]
-                del l_aux_size_seq[np.argmin(l_aux_size_seq)]
+    d_width = max([len(s_filename) for s_filename in l_filenames] + [len('Total')])
+    s_format = '%-' + str(d_width) + 's %8s %10s %10s %10s %10s %9s'
 
-        d_count = -1
-        for line in l_aux_clean:
-            d_count += 1
-            if line == '$!@':
-                del l_clean[d_count]
-                d_count -= 1
+    l_report = [s_format % ('File', 'State', 'Records', 'Kept', 'Filtered', 'Trimmed', 'MB/s')]
+    for s_filename, a_row in zip(l_filenames, a_counters):
+        if b_active_only and a_row[L_COUNTERS.index('state')] not in [D_STATE_RUNNING, D_STATE_FAILED]:
+            continue
+        d_seconds = a_row[L_COUNTERS.index('seconds')]
+        d_speed = a_row[L_COUNTERS.index('bytes')] / 1024 ** 2 / d_seconds if d_seconds > 0 else 0
+        l_report.append(s_format % (
+            (s_filename, L_STATES[int(a_row[L_COUNTERS.index('state')])]) +
+            tuple('%d' % a_row[L_COUNTERS.index(s_counter)]
+                  for s_counter in ['records', 'kept', 'filtered', 'trimmed']) +
+            ('%.1f' % d_speed,)))
 
-        s_path_filename_updated = s_path_filename[:-6] + '_trimmed' + '.fasta'
-        s_path_filename_removed = s_path_filename[:-6] + '_removed' + '.fasta'
+    d_bytes = a_counters[:, L_COUNTERS.index('bytes')].sum()
+    l_report.append(s_format % (
+        ('Total', '%d%%' % (100 * d_bytes / d_size if d_size else 100)) +
+        tuple('%d' % a_counters[:, L_COUNTERS.index(s_counter)].sum()
+              for s_counter in ['records', 'kept', 'filtered', 'trimmed']) + ('',)))
 
-        print('Creation of ' + s_path_filename_updated +
-              ' and ' + s_path_filename_removed)
-        with open(s_path_filename_updated, 'w') as f:
-            f.writelines(l_clean)
+    return l_report
 
-        with open(s_path_filename_removed, 'w') as f:
-            f.writelines(l_removed)
 
 # %% MAIN
 
@@ -392,28 +1593,140 @@ def f_update_file(s_path_filename):
 @click.command()
 @click.argument('s_path_data', default=os.getcwd(), nargs=1)
 @click.option('--f', default='')
-def main(s_path_data, f):
+@click.option('--tie-breaker', 'l_tie_breakers', multiple=True,
+              type=click.Choice(sorted(D_TIE_BREAKERS)), default=L_TIE_BREAKERS,
+              help='Criteria used, in order, to choose between sequences of the same size')
+@click.option('--dry-run', 'b_dry_run', is_flag=True,
+              help='Only report how many sequences would be kept and removed')
+@click.option('--checkpoint-every', 'd_checkpoint_every', default=D_CHECKPOINT_EVERY,
+              type=click.IntRange(min=1),
+              help='Number of processed files between two checkpoints of the journal')
+@click.option('--memory-limit', 'd_memory_limit', default=None, type=click.IntRange(min=1),
+              help='Maximum memory (in MB) used to rank the sequences of a file, '
+                   'the ranking is then done on disk (for files larger than the memory)')
+@click.option('--check', 'b_check', is_flag=True,
+              help='Check that every engine selects the same sequences as the reference '
+                   'implementation, with the given --selection, --memory-limit and --jobs '
+                   '(no file is written in the folder)')
+@click.option('--selection', 's_selection', default='longest', type=click.Choice(L_SELECTIONS),
+              help='Keep the longest sequences of each species or the ones closest to '
+                   'the k-mer consensus of the species')
+@click.option('--jobs', 'd_jobs', default=1, type=click.IntRange(min=1),
+              help='Number of files processed at the same time (in separate processes)')
+def main(s_path_data, f, l_tie_breakers, b_dry_run, d_checkpoint_every, d_memory_limit, b_check,
+         s_selection, d_jobs):
+
+    if s_selection != 'longest' and d_memory_limit is not None:
+        raise click.UsageError('--selection ' + s_selection + ' can not be used with --memory-limit')
 
     if not (f == ''):
         s_path_data = f
 
     os.chdir(s_path_data)
 
-    # Read files in folder
-    list_of_file = [s_f for s_f in os.listdir(
-        s_path_data) if os.path.isfile(os.path.join(s_path_data, s_f))]
+    # Read files in folder (sorted so that the files are always processed in the same order)
+    list_of_file = sorted(s_f for s_f in os.listdir(
+        s_path_data) if os.path.isfile(os.path.join(s_path_data, s_f)))
+
+    # Files already processed by an interrupted batch, files to process and files
+    # processed since the last checkpoint
+    s_path_journal = os.path.join(s_path_data, S_JOURNAL_FILENAME)
+    set_journal = f_read_journal(s_path_journal)
+    l_to_process = []
+    l_entries = []
+    l_paths_created = []
+
+    # Files for which an engine does not agree with the reference (check mode)
+    l_mismatch = []
 
     for s_filename in list_of_file:
         if (s_filename[-len(".fasta"):] == ".fasta") and \
                 not (s_filename[-len("removed.fasta"):] == "removed.fasta") and \
                 not (s_filename[-len("trimmed.fasta"):] == "trimmed.fasta") and \
                 not (s_filename[-len("updated.fasta"):] == "updated.fasta"):
-            print('Processing ' + s_filename)
-            f_update_file(os.path.join(s_path_data, s_filename))
+            if b_dry_run:
+                print('\n'.join(f_report_dry_run(
+                    s_filename, f_dry_run(os.path.join(s_path_data, s_filename)))))
+                continue
+
+            if b_check:
+                b_ok, l_report = f_check_file(
+                    os.path.join(s_path_data, s_filename), l_tie_breakers,
+                    64 * 1024 if d_memory_limit is None else d_memory_limit * 1024 ** 2,
+                    s_selection, d_jobs)
+                print('\n'.join(l_report))
+                if not b_ok:
+                    l_mismatch.append(s_filename)
+                continue
+
+            s_path_filename = os.path.join(s_path_data, s_filename)
+            s_entry = f_journal_entry(s_path_filename)
+            if s_entry in set_journal and \
+                    all(os.path.isfile(s_path) for s_path in f_output_paths(s_path_filename)):
+                print(s_filename + " is skipped because it was processed before the interruption")
+                continue
+
+            l_to_process.append((s_path_filename, s_entry))
         else:
             print(
                 s_filename + " is skipped because it is either already proccessed or not a .fasta file")
 
+    def f_on_done(d_index, l_paths):
+        nonlocal l_entries, l_paths_created
+        l_paths_created.extend(l_paths)
+        l_entries.append(l_to_process[d_index][1])
+
+        if len(l_entries) >= d_checkpoint_every:
+            f_checkpoint_journal(s_path_journal, l_entries, l_paths_created)
+            l_entries = []
+            l_paths_created = []
+
+    l_filenames = [os.path.basename(s_path_filename) for s_path_filename, s_entry in l_to_process]
+    d_size = sum(os.path.getsize(s_path_filename) for s_path_filename, s_entry in l_to_process)
+
+    # The table of the files being processed is redrawn in place in a terminal
+    l_previous = []
+
+    def f_poll(a_counters):
+        if not sys.stdout.isatty():
+            return
+        l_report = f_report_counters(l_filenames, a_counters, d_size, b_active_only=True)
+        if l_previous:
+            # Move the cursor up and clear the previous table
+            sys.stdout.write('\x1b[' + str(len(l_previous)) + 'F\x1b[J')
+        sys.stdout.write('\n'.join(l_report) + '\n')
+        sys.stdout.flush()
+        l_previous[:] = l_report
+
+    if l_to_process:
+        counters = SharedCounters(len(l_to_process))
+        try:
+            try:
+                f_run_files([s_path_filename for s_path_filename, s_entry in l_to_process], counters,
+                            d_jobs,
+                            {'l_tie_breakers': l_tie_breakers,
+                             'd_memory_limit': None if d_memory_limit is None else d_memory_limit * 1024 ** 2,
+                             's_selection': s_selection},
+                            f_on_done, f_poll if d_jobs > 1 else None)
+            finally:
+                # The files processed since the last checkpoint are recorded, even if the
+                # batch is interrupted, so that they are not processed again
+                if l_entries:
+                    f_checkpoint_journal(s_path_journal, l_entries, l_paths_created)
+            print('\n'.join(f_report_counters(l_filenames, counters.array, d_size)))
+        finally:
+            counters.close()
+            counters.unlink()
+
+    # The whole folder is processed: the journal is not needed anymore
+    # (a new run processes every file again)
+    if not (b_dry_run or b_check) and os.path.isfile(s_path_journal):
+        os.remove(s_path_journal)
+
+    if l_mismatch:
+        raise click.ClickException('the engines do not agree with the reference for ' +
+                                   ', '.join(l_mismatch))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+
+Original f_update_file of s_trim_fasta_seq.py, used by the tests as an oracle for the
+engines of the current script.
+
+It is only changed for the fixes documented since then (each one is marked by a
+"# Fix:" comment):
+1 - Every line ending is accepted, white space only lines are empty lines and the size
+    of a sequence does not count the line endings
+2 - A header is edited when it contains more "_" than spaces, decided for each header
+3 - Sequences of the same size are ranked with the tie breakers
+4 - The last sequence of the file can be trimmed
+5 - The trimmed sequences are written to the removed file in the order of the file
+
+"""
+
+
+def f_tie_values(line, l_seq, l_tie_breakers):
+    # Fix 3: values of the tie breakers, the worst sequence having the lowest values
+    # (more ambiguous bases, older version of the accession number)
+    s_accession = line[1:].split()[0] if line[1:].split() else ''
+    s_version = s_accession.partition('.')[2]
+    d_digits = len(s_version) - len(s_version.lstrip('0123456789'))
+    d_ties = {'ambiguous': -sum(len([c for c in s[:-1] if c not in 'ACGTacgt']) for s in l_seq),
+              'version': int(s_version[:d_digits]) if d_digits else 0}
+    return tuple(d_ties[s_tie] for s_tie in l_tie_breakers)
+
+
+def f_update_file(s_path_filename, l_tie_breakers=('ambiguous', 'version')):
+    """
+        This function clean the file then start by removing unwanted sequences that contain
+        (in lower or upper case) "sp", "cf" or "mitochondrion" in their name.
+        Sequence names ending with "idae" are also removed.
+        Finally, if there are more than 3 sequences associated with the same species name
+        then only the 3 longest sequences are kept.
+
+        Args:
+            s_path_filename: Absolute path to the file that will be processed
+            l_tie_breakers: Names of the tie breakers, in order
+
+        Returns:
+            None
+
+    """
+
+    # Read all the file
+    # Fix 1: the lines are split on every line ending and stripped
+    with open(s_path_filename, 'r', newline='') as f:
+        lines = [line.strip() + '\n' for line in f.read().splitlines()]
+
+    # Clean list (remove potential extra empty line and be sure to have a empty line
+    # before each sequence except the first one)
+    l_clean = []
+
+    # First sequence
+    b_first_sequence = 1
+
+    for line in lines:
+
+        # Find the lines associated with the symbol '>' as a start
+        # If the symbol '>' is found then extract each group of "words"
+        if line[0] == '>':
+
+            if b_first_sequence == 1:
+                l_clean.append(line)
+                b_first_sequence = 0
+
+            else:
+                l_clean.append('\n')
+                l_clean.append(line)
+
+        else:
+            if not (line[0] == '\n') and b_first_sequence == 0:
+                l_clean.append(line)
+
+    l_clean.append('\n')
+
+    # List of removed sequences
+    l_removed = []
+
+    # Names and sequence size
+    l_names = []
+    l_seq_size = []
+
+    # Fix 2: edited or raw header of each name
+    l_edited = []
+
+    # Index of names
+    l_index_names = []
+
+    # Once the sequences format is cleaned then the selection can be performed
+    # Index of lines
+    d_line_number = -1
+
+    while d_line_number < len(l_clean)-1:
+        d_line_number += 1
+
+        line = l_clean[d_line_number]
+
+        # If the symbol '>' is found then extract each group of "words"
+        if line[0] == '>':
+
+            # Fix 1 and 2: the words are split without the line ending
+            if line.count('_') > line.count(' '):
+                words = line[:-1].split('_')
+                b_edited = 1
+            else:
+                words = line.split()
+                b_edited = 0
+
+            # Test if one of the 2nd, 3rd or 4th word contain only "sp", "sp.", "cf" or "cf." (passing everything in lowercase for every tests)
+            # Boolean to decide if the squence is kept or not
+            b_keep = 1
+
+            # Convert the words of interest in lowercase
+            list_lowercase = [x.lower() for x in words]  # [1:4]]
+
+            words_to_check = ['sp.', 'sp', 'cf', 'cf.', 'mitochondrion', 'mitochondrion,', 'mitochondrion,\n']
+            if any(word in list_lowercase or words[1][-4:] == 'idae' for word in words_to_check):
+                b_keep = 0
+
+        if b_edited:
+
+            # If the sequence is kept, the name and sequence size are saved
+            if b_keep == 1:
+                l_names.append(words)
+                l_edited.append(b_edited)
+
+                l_clean[d_line_number] = '_'.join(words) + '\n'
+
+                d_size_seq = 0
+
+                l_index_names.append(d_line_number)
+
+                while l_clean[d_line_number] != '\n':
+                    d_line_number += 1
+                    # Fix 1: the line ending is not counted
+                    d_size_seq += len(l_clean[d_line_number]) - 1
+
+                l_seq_size.append((d_size_seq,) + f_tie_values(
+                    line, l_clean[l_index_names[-1] + 1:d_line_number], l_tie_breakers))
+
+            # Else the sequence is removed and save in the removed list
+            else:
+
+                l_removed.append('_'.join(words) + '\n')
+
+                while l_clean[d_line_number] != '\n':
+                    del l_clean[d_line_number]
+                    l_removed.append(l_clean[d_line_number])
+
+                del l_clean[d_line_number]
+
+                d_line_number -= 1
+
+        else:
+            # If the sequence is kept, the name and sequence size are saved
+            if b_keep == 1:
+                l_names.append(words)
+                l_edited.append(b_edited)
+
+                if len(words) == 4:
+                    l_clean[d_line_number] = '_'.join(
+                        [words[0][:-2], words[1], words[2], words[3]]) + '\n'
+                else:
+                    l_clean[d_line_number] = '_'.join(
+                        [words[0], words[1], words[2]]) + '\n'
+
+                d_size_seq = 0
+
+                l_index_names.append(d_line_number)
+
+                while l_clean[d_line_number] != '\n':
+                    d_line_number += 1
+                    # Fix 1: the line ending is not counted
+                    d_size_seq += len(l_clean[d_line_number]) - 1
+
+                l_seq_size.append((d_size_seq,) + f_tie_values(
+                    line, l_clean[l_index_names[-1] + 1:d_line_number], l_tie_breakers))
+
+            # Else the sequence is removed and save in the removed list
+            else:
+
+                if len(words) == 4:
+                    l_removed.append(
+                        '_'.join([words[0][:-2], words[1], words[2], words[3]]) + '\n')
+
+                else:
+                    l_removed.append(
+                        '_'.join([words[0], words[1], words[2]]) + '\n')
+
+                while l_clean[d_line_number] != '\n':
+                    del l_clean[d_line_number]
+                    l_removed.append(l_clean[d_line_number])
+
+                del l_clean[d_line_number]
+
+                d_line_number -= 1
+
+    # Process and identify the name that are present more than 3 times
+    # Fix 2: the name depends on the header of each sequence
+    l_aux_names = []
+    for name, b_name_edited in zip(l_names, l_edited):
+        if b_name_edited:
+            l_aux_names.append('_'.join(name[-3:-1]))
+        else:
+            l_aux_names.append('_'.join(name[1:3]))
+
+    # Only keep different names
+    l_unique_names = list(set(l_aux_names))
+
+    # For each name count how many examples they are
+    l_count_names = []
+    for name in l_unique_names:
+        l_count_names.append(l_aux_names.count(name))
+
+    # Identify the one that are more than 3 examples:
+    l_redondant_seq = []
+    l_number_of_seq = []
+
+    # Number of sequence to keep
+    d_seq_to_keep = 3
+
+    # Auxiliary sequence (removing sequences by inserting a unique sequences to preserve the previous indexation)
+    l_aux_clean = list(l_clean)
+
+    # Better "pythonic way" to code this (should be changed)
+    d_count = -1
+    for d_size in l_count_names:
+        d_count += 1
+        if d_size > d_seq_to_keep:
+            l_redondant_seq.append(l_unique_names[d_count])
+            l_number_of_seq.append(l_count_names[d_count])
+
+    # Identify and only keep the 3 biggest sequences
+    # <=> removing the smallest sequences until there are 3 left
+    for redondant_name in l_redondant_seq:
+        d_count = -1
+        l_aux_size_seq = []
+        l_aux_index_seq = []
+        for name in l_aux_names:
+            d_count += 1
+            if name == redondant_name:
+                l_aux_size_seq.append(l_seq_size[d_count])
+                l_aux_index_seq.append(d_count)
+
+        # Identify the sequences that need to be removed
+        while len(l_aux_size_seq) > d_seq_to_keep:
+
+            # Fix 3: first of the smallest (size, tie breakers), as np.argmin
+            d_argmin = l_aux_size_seq.index(min(l_aux_size_seq))
+
+            d_index_line = l_index_names[l_aux_index_seq[d_argmin]]
+
+            # Fix 4: the last sequence ends at the end of the file
+            if l_aux_index_seq[d_argmin] + 1 < len(l_index_names):
+                d_index_end = l_index_names[l_aux_index_seq[d_argmin] + 1]
+            else:
+                d_index_end = len(l_clean)
+
+            for d_aux_index_line in range(d_index_line, d_index_end):
+
+                # Choose a special series of characters to remove later
+                l_aux_clean[d_aux_index_line] = '$!@'
+
+            del l_aux_index_seq[d_argmin]
+            del l_aux_size_seq[d_argmin]
+
+    # Fix 5: the trimmed lines are removed in the order of the file
+    for d_aux_index_line, line in enumerate(l_aux_clean):
+        if line == '$!@':
+            l_removed.append(l_clean[d_aux_index_line])
+
+    d_count = -1
+    for line in l_aux_clean:
+        d_count += 1
+        if line == '$!@':
+            del l_clean[d_count]
+            d_count -= 1
+
+    s_path_filename_updated = s_path_filename[:-6] + '_trimmed' + '.fasta'
+    s_path_filename_removed = s_path_filename[:-6] + '_removed' + '.fasta'
+
+    print('Creation of ' + s_path_filename_updated +
+          ' and ' + s_path_filename_removed)
+    with open(s_path_filename_updated, 'w') as f:
+        f.writelines(l_clean)
+
+    with open(s_path_filename_removed, 'w') as f:
+        f.writelines(l_removed)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts are not installed: they are imported from the folder of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+
+Property based tests (Hypothesis) checking that the engines of s_trim_fasta_seq select
+the same sequences as the original script (baseline_trim_fasta_seq, only changed for
+the documented fixes), and that they stay faster than it.
+
+HOW TO USE: in the folder of the repository type
+python -m pytest
+
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from hypothesis import given, settings, strategies as st
+
+import s_trim_fasta_seq as trim
+import baseline_trim_fasta_seq as baseline
+
+
+# Species of the generated files: the 4th one is removed by the "idae" test
+L_SPECIES = [('Lumbrineris', 'japonica'), ('Lumbrineris', 'latreilli'), ('Glycera', 'alba'),
+             ('Nereididae', 'indet')]
+
+# Words added after the species name, some of them removing the sequence
+L_EXTRA_WORDS = ['voucher', 'BIOUG01', 'gene,', 'COI', 'sp.', 'CF', 'mitochondrion,']
+
+# Sizes of the sequences, few of them so that several sequences have the same size
+L_SIZES = [0, 5, 8, 13]
+
+# Number of records and minimum speedup of the speed test (about 8 times faster with
+# 6000 records, the original script being quadratic in the number of sequences of a
+# species)
+D_SPEED_RECORDS = 6000
+D_MIN_SPEEDUP = 4
+
+
+@st.composite
+def st_header(draw, s_genus, s_species):
+    # Raw NCBI header (">HQ932670.1 Lumbrineris japonica voucher ...") or already
+    # edited header (">HQ932670_Lumbrineris_japonica_voucher")
+    s_accession = draw(st.sampled_from(['HQ', 'KX', 'NC_'])) + str(draw(st.integers(0, 99999)))
+    s_version = draw(st.sampled_from(['', '.1', '.2', '.10']))
+    l_extra = draw(st.lists(st.sampled_from(L_EXTRA_WORDS), max_size=2))
+    if draw(st.booleans()):
+        return '>' + '_'.join([s_accession + s_version, s_genus, s_species] + l_extra)
+    return '>' + ' '.join([s_accession + s_version, s_genus, s_species] + l_extra)
+
+
+@st.composite
+def st_fasta(draw):
+    # Text of a FASTA file: a number of sequences around D_SEQ_TO_KEEP for each
+    # species, every line ending, wrapped sequences and blank lines
+    l_records = []
+    for d_index, (s_genus, s_species) in enumerate(L_SPECIES):
+        d_count = draw(st.integers(1 if d_index == 0 else 0, trim.D_SEQ_TO_KEEP + 2))
+        for d_record in range(d_count):
+            s_header = draw(st_header(s_genus, s_species))
+            d_size = draw(st.sampled_from(L_SIZES))
+            s_seq = draw(st.text(alphabet='ACGTN', min_size=d_size, max_size=d_size))
+            d_width = draw(st.integers(1, 8))
+            l_lines = [s_header] + [s_seq[d:d + d_width] for d in range(0, len(s_seq), d_width)]
+            l_lines += draw(st.lists(st.sampled_from(['', '  ']), max_size=1))
+            l_records.append(l_lines)
+
+    s_eol = draw(st.sampled_from(['\n', '\r\n', '\r']))
+    s_text = s_eol.join(line for l_lines in draw(st.permutations(l_records)) for line in l_lines)
+    if draw(st.booleans()):
+        s_text += s_eol
+    return s_text
+
+
+def f_write_fasta(s_path_dir, s_filename, s_text):
+    s_path_filename = os.path.join(s_path_dir, s_filename)
+    with open(s_path_filename, 'w', newline='') as f:
+        f.write(s_text)
+    return s_path_filename
+
+
+def f_read_fasta(s_path_filename):
+    # Records of an output file as (header, sequence)
+    l_records = []
+    with open(s_path_filename, 'r', newline='') as f:
+        for line in f.read().splitlines():
+            if line[:1] == '>':
+                l_records.append((line, ''))
+            elif line.strip():
+                l_records[-1] = (l_records[-1][0], l_records[-1][1] + line.strip())
+    return l_records
+
+
+def f_run_baseline(s_path_filename, l_tie_breakers):
+    # The original script is run on a copy, in its own folder
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_copy = shutil.copy(s_path_filename, s_path_dir)
+        baseline.f_update_file(s_path_copy, l_tie_breakers)
+        return [f_read_fasta(s_path) for s_path in trim.f_output_paths(s_path_copy)]
+
+
+def f_run_engine(s_path_filename, l_tie_breakers, **d_kwargs):
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_copy = shutil.copy(s_path_filename, s_path_dir)
+        return [f_read_fasta(s_path) for s_path in
+                trim.f_update_file(s_path_copy, l_tie_breakers, **d_kwargs)]
+
+
+@settings(max_examples=200, deadline=None)
+@given(st_fasta(), st.lists(st.sampled_from(sorted(trim.D_TIE_BREAKERS)), unique=True))
+def test_engines_match_baseline(s_text, l_tie_breakers):
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', s_text)
+        l_expected = f_run_baseline(s_path_filename, l_tie_breakers)
+
+        # In memory, then on disk with one run for each sequence (several merge levels)
+        assert f_run_engine(s_path_filename, l_tie_breakers) == l_expected
+        assert f_run_engine(s_path_filename, l_tie_breakers, d_memory_limit=1) == l_expected
+
+        # Reference of the check mode and counts of the dry run
+        l_clean, l_removed, d_species = trim.f_reference_selection(s_path_filename, l_tie_breakers)
+        assert [l_clean, l_removed] == l_expected
+        assert trim.f_dry_run(s_path_filename) == d_species
+
+
+@settings(max_examples=100, deadline=None)
+@given(st_fasta())
+def test_consensus_keeps_as_many_sequences(s_text):
+    # The consensus keeps other sequences than the longest ones, but as many of them
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', s_text)
+        l_clean, l_removed = f_run_baseline(s_path_filename, trim.L_TIE_BREAKERS)
+        l_clean_consensus, l_removed_consensus = f_run_engine(
+            s_path_filename, trim.L_TIE_BREAKERS, s_selection='consensus')
+
+        assert len(l_clean_consensus) == len(l_clean)
+        assert Counter(l_clean_consensus + l_removed_consensus) == Counter(l_clean + l_removed)
+
+
+@settings(max_examples=50, deadline=None)
+@given(st_fasta())
+def test_verbatim_records(s_text):
+    # The records of a created file are copied as they are when it is processed again
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', s_text)
+        s_path_trimmed, s_path_removed = trim.f_update_file(s_path_filename)
+        s_path_again = shutil.copy(s_path_trimmed, os.path.join(s_path_dir, 'again.fasta'))
+
+        assert all(record.verbatim for record in trim.f_read_records(s_path_again))
+        assert f_run_engine(s_path_again, trim.L_TIE_BREAKERS) == \
+            f_run_baseline(s_path_again, trim.L_TIE_BREAKERS)
+
+
+def test_copy_without_kernel_copy(monkeypatch):
+    # Windows has neither os.copy_file_range, os.sendfile nor os.pread: the records
+    # are then copied by reading and writing them
+    l_lines = ['>HQ%06d_Lumbrineris_japonica_voucher\nACGT%s\n' % (d, 'A' * d) for d in range(10)]
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', '\n'.join(l_lines) + '\n')
+        l_expected = []
+        for s_path in trim.f_update_file(s_path_filename, d_memory_limit=1):
+            with open(s_path, 'rb') as f:
+                l_expected.append(f.read())
+
+        for s_function in ['copy_file_range', 'sendfile', 'pread']:
+            monkeypatch.delattr(os, s_function, raising=False)
+        l_outputs = []
+        for s_path in trim.f_update_file(s_path_filename, d_memory_limit=1):
+            with open(s_path, 'rb') as f:
+                l_outputs.append(f.read())
+
+    assert l_outputs == l_expected
+    assert l_expected[1].count(b'>') == 7
+
+
+def test_refseq_version():
+    # The newer version of a RefSeq accession ("NC_", "NM_", ... with a "_") is kept
+    assert trim.f_accession_version('>NC_012345.2 Lumbrineris japonica voucher') == 2
+    assert trim.f_accession_version('>NC_012345.2_Lumbrineris_japonica') == 2
+
+    # The version is cut from the new headers: the sequences tell the records apart
+    l_lines = ['>NC_012345.1 Lumbrineris japonica voucher', 'AAAA',
+               '>NC_012345.2 Lumbrineris japonica voucher', 'CCCC',
+               '>HQ000001.1 Lumbrineris japonica voucher', 'ACGTACGT',
+               '>HQ000002.1 Lumbrineris japonica voucher', 'ACGTACGT']
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', '\n'.join(l_lines) + '\n')
+        l_expected = f_run_baseline(s_path_filename, ['version'])
+        l_clean, l_removed = f_run_engine(s_path_filename, ['version'])
+
+    assert l_removed == [('>NC_012345_Lumbrineris_japonica_voucher', 'AAAA')]
+    assert ('>NC_012345_Lumbrineris_japonica_voucher', 'CCCC') in l_clean
+    assert [l_clean, l_removed] == l_expected
+
+
+@settings(max_examples=50, deadline=None)
+@given(st_fasta(), st.sampled_from(trim.L_SELECTIONS))
+def test_check_file(s_text, s_selection):
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', s_text)
+        b_ok, l_report = trim.f_check_file(s_path_filename, trim.L_TIE_BREAKERS, 1, s_selection)
+
+        assert b_ok, l_report
+        assert os.listdir(s_path_dir) == ['test.fasta']
+
+
+@settings(max_examples=100, deadline=None)
+@given(st.lists(st.lists(st.tuples(st.text(max_size=2), st.integers())), max_size=20),
+       st.integers(2, 4))
+def test_merge_runs(l_runs, d_fan_in):
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        l_path_runs = [trim.f_write_run(s_path_dir, list(l_keys)) for l_keys in l_runs]
+        l_merged = list(trim.f_merge_runs(s_path_dir, l_path_runs, d_fan_in))
+
+        assert l_merged == sorted(key for l_keys in l_runs for key in l_keys)
+        # The runs merged in intermediate levels are deleted
+        assert len(os.listdir(s_path_dir)) <= d_fan_in
+
+
+@settings(max_examples=5, deadline=None)
+@given(st.lists(st_fasta(), min_size=2, max_size=4))
+def test_parallel_jobs(l_texts):
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        l_path_filenames = [f_write_fasta(s_path_dir, 'test' + str(d_index) + '.fasta', s_text)
+                            for d_index, s_text in enumerate(l_texts)]
+        l_expected = [f_run_baseline(s_path_filename, trim.L_TIE_BREAKERS)
+                      for s_path_filename in l_path_filenames]
+
+        counters = trim.SharedCounters(len(l_path_filenames))
+        try:
+            trim.f_run_files(l_path_filenames, counters, 2)
+            a_states = counters.array[:, trim.L_COUNTERS.index('state')].copy()
+        finally:
+            counters.close()
+            counters.unlink()
+
+        assert (a_states == trim.D_STATE_DONE).all()
+        assert [[f_read_fasta(s_path) for s_path in trim.f_output_paths(s_path_filename)]
+                for s_path_filename in l_path_filenames] == l_expected
+
+
+def test_speedup():
+    # A species with many sequences: the original script removes them one at a time
+    rand = random.Random(0)
+    l_lines = []
+    for d_record in range(D_SPEED_RECORDS):
+        l_lines.append('>HQ%06d.1 Lumbrineris japonica voucher' % d_record)
+        s_seq = ''.join(rand.choice('ACGT') for d in range(rand.randint(100, 700)))
+        l_lines += [s_seq[d:d + 70] for d in range(0, len(s_seq), 70)]
+
+    with tempfile.TemporaryDirectory() as s_path_dir:
+        s_path_filename = f_write_fasta(s_path_dir, 'test.fasta', '\n'.join(l_lines) + '\n')
+
+        d_time = time.perf_counter()
+        l_expected = f_run_baseline(s_path_filename, trim.L_TIE_BREAKERS)
+        d_time_baseline = time.perf_counter() - d_time
+
+        d_time = time.perf_counter()
+        l_outputs = f_run_engine(s_path_filename, trim.L_TIE_BREAKERS)
+        d_time_engine = time.perf_counter() - d_time
+
+    assert l_outputs == l_expected
+    assert d_time_baseline >= D_MIN_SPEEDUP * d_time_engine, \
+        'baseline %.3f s, engine %.3f s' % (d_time_baseline, d_time_engine)